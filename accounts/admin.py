@@ -40,7 +40,10 @@ class EmailVerificationAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     """UserProfile admin."""
-    list_display = ['user', 'nickname', 'created_at']
+    list_display = ['user', 'nickname', 'adverts_count', 'replies_sent_count', 'created_at']
     search_fields = ['user__email', 'nickname']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = [
+        'adverts_count', 'replies_sent_count', 'replies_received_count', 'replies_accepted_count',
+        'created_at', 'updated_at',
+    ]
 
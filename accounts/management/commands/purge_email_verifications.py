@@ -0,0 +1,29 @@
+"""
+Management command to delete expired and used email verification codes.
+"""
+from django.core.management.base import BaseCommand
+from accounts.services import purge_email_verifications
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and used email verification codes in chunks (one-off backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows per DELETE (default: EMAIL_VERIFICATION_PURGE_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between chunks to reduce load (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_email_verifications(
+            chunk_size=options.get('chunk_size'),
+            pause=options.get('pause', 0),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} email verification codes.'))
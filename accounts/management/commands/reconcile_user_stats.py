@@ -0,0 +1,21 @@
+"""
+Management command to recompute user profile statistics.
+"""
+from django.core.management.base import BaseCommand
+from accounts.services import reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Create missing user profiles and recompute their statistics (adverts, replies sent/received/accepted)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users per UPDATE (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        total = reconcile_user_stats(batch_size=options.get('batch_size', 1000))
+        self.stdout.write(self.style.SUCCESS(f'Reconciled statistics of {total} users.'))
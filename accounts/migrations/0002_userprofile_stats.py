@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_stats(apps, schema_editor):
+    """Create missing profiles and count existing adverts and replies, as accounts.services.reconcile_user_stats does."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    Advert = apps.get_model('adverts', 'Advert')
+    Reply = apps.get_model('replies', 'Reply')
+
+    def count(queryset, field):
+        return Coalesce(
+            models.Subquery(queryset.order_by().values(field).annotate(count=models.Count('pk')).values('count')),
+            0,
+        )
+
+    replies = Reply.objects.exclude(status='deleted')
+    last_id = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:1000])
+        if not ids:
+            return
+        last_id = ids[-1]
+        UserProfile.objects.bulk_create([UserProfile(user_id=pk) for pk in ids], ignore_conflicts=True)
+        UserProfile.objects.filter(user_id__in=ids).update(
+            adverts_count=count(Advert.objects.filter(author=models.OuterRef('user_id')), 'author'),
+            replies_sent_count=count(replies.filter(author=models.OuterRef('user_id')), 'author'),
+            # Reply.advert_owner появляется позже (replies 0003) - автор объявления берётся через advert
+            replies_received_count=count(replies.filter(advert__author=models.OuterRef('user_id')), 'advert__author'),
+            replies_accepted_count=count(
+                replies.filter(author=models.OuterRef('user_id'), status='accepted'), 'author'
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('adverts', '0001_initial'),
+        ('replies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='adverts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Объявлений'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='replies_accepted_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов принято'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='replies_received_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов получено'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='replies_sent_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов отправлено'),
+        ),
+        # Без пересчёта уменьшение статистики за старые объявления нарушило бы CHECK (>= 0)
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -64,13 +64,30 @@ class UserProfile(models.Model):
     nickname = models.CharField(max_length=50, blank=True, verbose_name='Никнейм')
     avatar = models.ImageField(upload_to='avatars/%Y/%m/', blank=True, null=True, verbose_name='Аватар')
     about = models.TextField(blank=True, verbose_name='О себе')
+    # Статистика для страницы профиля (отклики без удалённых); меняется только
+    # F()-обновлениями из сигналов accounts.signals, сверяется командой reconcile_user_stats
+    adverts_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Объявлений')
+    replies_sent_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов отправлено')
+    replies_received_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов получено')
+    replies_accepted_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов принято')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлён')
     
+    STAT_FIELDS = ('adverts_count', 'replies_sent_count', 'replies_received_count', 'replies_accepted_count')
+    
     class Meta:
         verbose_name = 'Профиль пользователя'
         verbose_name_plural = 'Профили пользователей'
     
     def __str__(self):
         return f'Профиль {self.user.email}'
+    
+    def save(self, *args, **kwargs):
+        # Редактирование профиля не перезаписывает счётчики устаревшими значениями
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STAT_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
@@ -1,9 +1,14 @@
 """
 Services for accounts app.
 """
+import time
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import EmailVerification, User, UserProfile
 
 
 def send_verification_email(user, code):
@@ -31,3 +36,75 @@ def send_verification_email(user, code):
         fail_silently=False,
     )
 
+
+def _delete_in_chunks(queryset, chunk_size, pause):
+    deleted = 0
+    while True:
+        # Ключи пачки берутся диапазоном по индексу expires_at, удаление - по pk
+        pks = list(queryset.order_by('expires_at').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        deleted += EmailVerification.objects.filter(pk__in=pks).delete()[0]
+        if len(pks) < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def purge_email_verifications(chunk_size=None, pause=0):
+    """
+    Delete expired and used email verification codes in bounded chunks.
+    
+    Обе выборки - диапазоны по индексу expires_at: истёкшие коды лежат
+    до текущего момента, использованные, но ещё не истёкшие - в коротком
+    окне после него. Каждая пачка - отдельный короткий DELETE.
+    Returns the number of deleted rows.
+    """
+    chunk_size = chunk_size or getattr(settings, 'EMAIL_VERIFICATION_PURGE_CHUNK_SIZE', 1000)
+    now = timezone.now()
+    expired = EmailVerification.objects.filter(expires_at__lt=now)
+    used = EmailVerification.objects.filter(expires_at__gte=now, is_used=True)
+    return _delete_in_chunks(expired, chunk_size, pause) + _delete_in_chunks(used, chunk_size, pause)
+
+
+def update_user_stats(profiles, **deltas):
+    """Apply stat deltas to a UserProfile queryset with a single UPDATE ... SET x = x ± n."""
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if updates:
+        profiles.update(**updates)
+
+
+def reconcile_user_stats(batch_size=1000):
+    """
+    Create missing profiles and recompute their stats, batch by batch of user ids.
+    
+    Счётчики считаются так же, как их меняют сигналы: все объявления
+    пользователя и его отклики без удалённых. Returns the number of users.
+    """
+    from adverts.models import Advert
+    from replies.models import Reply
+    
+    def count(queryset, field):
+        return Coalesce(
+            Subquery(queryset.order_by().values(field).annotate(count=Count('pk')).values('count')),
+            0,
+        )
+    
+    replies = Reply.objects.exclude(status=Reply.Status.DELETED)
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        last_id = ids[-1]
+        UserProfile.objects.bulk_create([UserProfile(user_id=pk) for pk in ids], ignore_conflicts=True)
+        UserProfile.objects.filter(user_id__in=ids).update(
+            adverts_count=count(Advert.objects.filter(author=OuterRef('user_id')), 'author'),
+            replies_sent_count=count(replies.filter(author=OuterRef('user_id')), 'author'),
+            replies_received_count=count(replies.filter(advert_owner=OuterRef('user_id')), 'advert_owner'),
+            replies_accepted_count=count(
+                replies.filter(author=OuterRef('user_id'), status=Reply.Status.ACCEPTED), 'author'
+            ),
+        )
+        total += len(ids)
@@ -1,9 +1,14 @@
 """
 Signals for accounts app.
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from adverts.models import Advert
+from replies.services import STATUS_COUNTER_FIELDS
+from replies.models import Reply
+from replies.signals import reply_status_changed
 from .models import User, UserProfile
+from .services import update_user_stats
 
 
 @receiver(post_save, sender=User)
@@ -12,3 +17,32 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.get_or_create(user=instance)
 
+
+@receiver(post_save, sender=Advert)
+def count_created_advert(sender, instance, created, **kwargs):
+    """Count a new advert in its author's stats."""
+    if created:
+        update_user_stats(UserProfile.objects.filter(user_id=instance.author_id), adverts_count=1)
+
+
+@receiver(post_delete, sender=Advert)
+def count_deleted_advert(sender, instance, **kwargs):
+    """Remove a deleted advert from its author's stats."""
+    update_user_stats(UserProfile.objects.filter(user_id=instance.author_id), adverts_count=-1)
+
+
+@receiver(reply_status_changed)
+def count_reply_status_change(sender, reply, old_status, new_status, **kwargs):
+    """Move a reply between the stats of its author and of the advert owner."""
+    # Удалённые отклики не считаются, как и в счётчиках объявления
+    counted = int(new_status in STATUS_COUNTER_FIELDS) - int(old_status in STATUS_COUNTER_FIELDS)
+    accepted = int(new_status == Reply.Status.ACCEPTED) - int(old_status == Reply.Status.ACCEPTED)
+    update_user_stats(
+        UserProfile.objects.filter(user_id=reply.author_id),
+        replies_sent_count=counted,
+        replies_accepted_count=accepted,
+    )
+    update_user_stats(
+        UserProfile.objects.filter(user_id=reply.advert_owner_id),
+        replies_received_count=counted,
+    )
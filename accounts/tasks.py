@@ -0,0 +1,21 @@
+"""
+Tasks for accounts app (for APScheduler).
+"""
+from importlib import import_module
+from django.conf import settings
+from .services import purge_email_verifications
+
+
+def clear_expired_sessions():
+    """Delete expired sessions (same as manage.py clearsessions)."""
+    engine = import_module(settings.SESSION_ENGINE)
+    try:
+        engine.SessionStore.clear_expired()
+    except NotImplementedError:
+        # Бэкенды с собственным сроком жизни (кэш, cookies) чистить не нужно
+        pass
+
+
+def purge_expired_email_verifications():
+    """Periodic job: delete expired and used email verification codes."""
+    purge_email_verifications()
@@ -89,23 +89,14 @@ from django.contrib.auth.decorators import login_required
 def profile(request):
     """User profile view."""
     user = request.user
-    # Get or create profile
+    # Статистика хранится в профиле и поддерживается сигналами (accounts.signals),
+    # поэтому страница - одно чтение строки профиля
     from .models import UserProfile
     profile_obj, created = UserProfile.objects.get_or_create(user=user)
     
-    # Get user statistics
-    from adverts.models import Advert
-    from replies.models import Reply
-    
-    user_adverts_count = Advert.objects.filter(author=user).count()
-    user_replies_count = Reply.objects.filter(author=user).count()
-    
     context = {
         'user': user,
         'profile': profile_obj,
-        'user_adverts_count': user_adverts_count,
-        'user_replies_count': user_replies_count,
     }
     
     return render(request, 'accounts/profile.html', context)
-
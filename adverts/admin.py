@@ -3,6 +3,7 @@ Admin configuration for adverts app.
 """
 from django.contrib import admin
 from .models import Category, Advert, MediaAsset
+from .services import invalidate_advert_cache
 
 
 @admin.register(Category)
@@ -27,20 +28,26 @@ class AdvertAdmin(admin.ModelAdmin):
     
     def make_published(self, request, queryset):
         queryset.update(status=Advert.Status.PUBLISHED)
+        # update() не отправляет сигналы - сбрасываем кэш страниц вручную
+        invalidate_advert_cache(*queryset.values_list('pk', flat=True))
     make_published.short_description = 'Опубликовать выбранные'
     
     def make_archived(self, request, queryset):
         queryset.update(status=Advert.Status.ARCHIVED)
+        invalidate_advert_cache(*queryset.values_list('pk', flat=True))
     make_archived.short_description = 'Архивировать выбранные'
 
 
 @admin.register(MediaAsset)
 class MediaAssetAdmin(admin.ModelAdmin):
     """MediaAsset admin."""
-    list_display = ['file', 'type', 'owner', 'mime', 'size', 'created_at']
-    list_filter = ['type', 'mime', 'created_at']
+    list_display = ['file', 'type', 'owner', 'mime', 'size', 'processing_status', 'created_at']
+    list_filter = ['type', 'processing_status', 'mime', 'created_at']
     search_fields = ['owner__email', 'file']
-    readonly_fields = ['created_at', 'mime', 'size', 'width', 'height', 'duration']
+    readonly_fields = [
+        'created_at', 'mime', 'size', 'width', 'height', 'duration',
+        'processing_status', 'processed_at', 'variants',
+    ]
     date_hierarchy = 'created_at'
     raw_id_fields = ['owner']
 
@@ -5,4 +5,7 @@ class AdvertsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'adverts'
     verbose_name = 'Объявления'
+    
+    def ready(self):
+        import adverts.signals
 
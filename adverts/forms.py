@@ -1,17 +1,20 @@
 """
 Forms for adverts app.
 """
-import base64
 import mimetypes
 from django import forms
 from django.core.exceptions import ValidationError
 from django.conf import settings
-from .models import Advert, Category
+from .media import store_media
+from .models import Advert, Category, MediaAsset
 from .services import markdown_to_html
 
+# Форматы, которые сайт отдаёт как медиа (SVG может содержать скрипты)
+ALLOWED_IMAGE_TYPES = ['image/png', 'image/jpeg', 'image/webp', 'image/gif']
+ALLOWED_VIDEO_TYPES = ['video/mp4', 'video/webm']
 
 class AdvertForm(forms.ModelForm):
-    """Advertisement form with Markdown editor and base64 media upload."""
+    """Advertisement form with Markdown editor and media upload."""
     category = forms.ModelChoiceField(
         queryset=Category.objects.all(),
         label='Категория',
@@ -60,6 +63,10 @@ class AdvertForm(forms.ModelForm):
         model = Advert
         fields = ['category', 'title', 'body_md']
     
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+    
     def clean_upload_image(self):
         """Validate image file size."""
         image = self.cleaned_data.get('upload_image')
@@ -75,8 +82,7 @@ class AdvertForm(forms.ModelForm):
             
             # Проверка MIME типа
             mime_type = mimetypes.guess_type(image.name)[0]
-            allowed_types = ['image/png', 'image/jpeg', 'image/webp', 'image/gif']
-            if mime_type not in allowed_types:
+            if mime_type not in ALLOWED_IMAGE_TYPES:
                 raise ValidationError(
                     f'Недопустимый формат изображения. Разрешены: PNG, JPEG, WebP, GIF'
                 )
@@ -98,94 +104,92 @@ class AdvertForm(forms.ModelForm):
             
             # Проверка MIME типа
             mime_type = mimetypes.guess_type(video.name)[0]
-            allowed_types = ['video/mp4', 'video/webm']
-            if mime_type not in allowed_types:
+            if mime_type not in ALLOWED_VIDEO_TYPES:
                 raise ValidationError(
                     f'Недопустимый формат видео. Разрешены: MP4, WebM'
                 )
         
         return video
     
-    def _file_to_base64(self, file_field, file_type='image'):
-        """Convert uploaded file to base64 data URI."""
-        if not file_field:
+    def _media_owner(self):
+        """Owner for uploaded media: the current user or the advert author."""
+        if self.user is not None:
+            return self.user
+        return self.instance.author
+    
+    def _store_media(self, upload, media_type=MediaAsset.IMAGE):
+        """Persist uploaded file as MediaAsset (deduplicated by content) and return it."""
+        if not upload:
             return None
         
-        file_field.seek(0)  # Reset file pointer
-        file_content = file_field.read()
-        base64_content = base64.b64encode(file_content).decode('utf-8')
-        
         # Determine MIME type
-        mime_type = mimetypes.guess_type(file_field.name)[0]
-        if not mime_type:
-            # Fallback based on file type
-            if file_type == 'image':
-                mime_type = 'image/png'
+        mime_type = mimetypes.guess_type(upload.name)[0]
+        if not mime_type or (media_type == MediaAsset.VIDEO and mime_type not in ALLOWED_VIDEO_TYPES):
+            content_type = getattr(upload, 'content_type', None)
+            if content_type:
+                mime_type = content_type
             else:
-                # Try to determine from content_type if available
-                if hasattr(file_field, 'content_type') and file_field.content_type:
-                    mime_type = file_field.content_type
-                else:
-                    mime_type = 'video/mp4'
-        elif file_type == 'video' and mime_type not in ['video/mp4', 'video/webm']:
-            # Ensure video MIME type is correct
-            if hasattr(file_field, 'content_type') and file_field.content_type:
-                mime_type = file_field.content_type
+                mime_type = 'image/png' if media_type == MediaAsset.IMAGE else 'video/mp4'
         
-        # Create data URI
-        data_uri = f'data:{mime_type};base64,{base64_content}'
-        return data_uri
+        upload.seek(0)  # Reset file pointer
+        # Тот же файл уже загружен - используется сохранённая копия
+        asset, _ = store_media(self._media_owner().pk, upload, media_type, mime_type)
+        return asset
     
-    def _insert_media_to_markdown(self, body_md, image_data_uri=None, video_data_uri=None):
-        """Insert base64 media into Markdown text."""
-        if not image_data_uri and not video_data_uri:
+    def _insert_media_to_markdown(self, body_md, image_asset=None, video_asset=None):
+        """Insert references to stored media into Markdown text."""
+        if not image_asset and not video_asset:
             return body_md
         
-        # Find cursor position (end of text) or insert at the end
         lines_to_add = []
         
-        if image_data_uri:
+        if image_asset:
             # Insert image as Markdown
-            lines_to_add.append(f'\n\n![Изображение]({image_data_uri})\n')
+            lines_to_add.append(f'\n\n![Изображение]({image_asset.file.url})\n')
         
-        if video_data_uri:
-            # Extract MIME type from data URI
-            mime_type = 'video/mp4'  # default
-            if 'data:' in video_data_uri and ';base64,' in video_data_uri:
-                mime_part = video_data_uri.split('data:')[1].split(';base64,')[0]
-                if mime_part:
-                    mime_type = mime_part
-            
+        if video_asset:
             # Insert video as HTML (Markdown doesn't support video well)
-            lines_to_add.append(f'\n\n<video controls><source src="{video_data_uri}" type="{mime_type}"></video>\n')
+            lines_to_add.append(
+                f'\n\n<video controls preload="none"><source src="{video_asset.file.url}" type="{video_asset.mime}"></video>\n'
+            )
         
         # Append to body_md
         return body_md + ''.join(lines_to_add)
     
-    def save(self, commit=True):
-        instance = super().save(commit=False)
+    def attach_uploaded_media(self):
+        """
+        Store uploaded image/video as MediaAsset files and return body_md
+        with /media/ references appended.
         
-        # Process uploaded media files
+        Файлы загружаются один раз: после вызова поля загрузки очищаются,
+        а ссылки попадают в cleaned_data['body_md'].
+        """
+        body_md = self.cleaned_data.get('body_md', '')
         image = self.cleaned_data.get('upload_image')
         video = self.cleaned_data.get('upload_video')
         
         if image or video:
-            # Convert files to base64 and insert into Markdown
-            image_data_uri = None
-            video_data_uri = None
+            image_asset = self._store_media(image, MediaAsset.IMAGE)
+            video_asset = self._store_media(video, MediaAsset.VIDEO)
+            body_md = self._insert_media_to_markdown(body_md, image_asset, video_asset)
             
-            if image:
-                image_data_uri = self._file_to_base64(image, 'image')
+            self.cleaned_data['body_md'] = body_md
+            self.cleaned_data['upload_image'] = None
+            self.cleaned_data['upload_video'] = None
             
-            if video:
-                video_data_uri = self._file_to_base64(video, 'video')
-            
-            # Insert media into body_md
-            instance.body_md = self._insert_media_to_markdown(
-                instance.body_md,
-                image_data_uri,
-                video_data_uri
-            )
+            # Keep the rendered textarea in sync so the next submit
+            # references the stored files instead of re-uploading them
+            if self.is_bound:
+                self.data = self.data.copy()
+                self.data[self.add_prefix('body_md')] = body_md
+        
+        return body_md
+    
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        
+        # Store uploaded media files and reference them from Markdown
+        instance.body_md = self.attach_uploaded_media()
         
         # Convert Markdown to HTML
         instance.body_html = markdown_to_html(instance.body_md)
@@ -0,0 +1,55 @@
+"""
+Management command to backfill Advert.excerpt and Advert.thumbnail.
+
+Анонс строится из сохранённого search_text; сам search_text и поисковый
+индекс пересчитывает rebuild_search_index.
+"""
+from django.core.management.base import BaseCommand
+from adverts.models import Advert
+from adverts.services import extract_excerpt, extract_first_image
+
+
+class Command(BaseCommand):
+    help = 'Recompute list excerpts and thumbnails for adverts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Adverts per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Only process adverts with an empty excerpt',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size', 500)
+
+        queryset = Advert.objects.all()
+        if options.get('missing_only'):
+            queryset = queryset.filter(excerpt='')
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'body_md', 'search_text', 'excerpt', 'thumbnail')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for advert in batch:
+                advert.excerpt = extract_excerpt(advert.search_text)
+                advert.thumbnail = extract_first_image(advert.body_md)
+            Advert.objects.bulk_update(batch, ['excerpt', 'thumbnail'])
+
+            updated += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Processed {updated} adverts...')
+
+        self.stdout.write(self.style.SUCCESS(f'\nExcerpts updated for {updated} adverts.'))
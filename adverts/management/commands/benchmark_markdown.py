@@ -0,0 +1,97 @@
+"""
+Management command to benchmark Markdown rendering on the sample adverts corpus.
+"""
+import time
+
+import bleach
+from bs4 import BeautifulSoup
+from markdown_it import MarkdownIt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from adverts.management.commands.load_sample_adverts import SAMPLE_ADVERTS
+from adverts.services import markdown_to_html, get_markdown_pipeline
+
+
+def legacy_markdown_to_html(md_text):
+    """
+    Previous per-call implementation (new parser and Cleaner on every call,
+    second parse with BeautifulSoup). Kept only as a benchmark baseline.
+    """
+    if not md_text:
+        return ''
+
+    html = MarkdownIt("commonmark").render(md_text)
+    html = bleach.clean(
+        html,
+        tags=settings.BLEACH_ALLOWED_TAGS,
+        attributes=settings.BLEACH_ALLOWED_ATTRS,
+        protocols=settings.BLEACH_ALLOWED_PROTOCOLS,
+        strip=True,
+        strip_comments=True
+    )
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for link in soup.find_all('a', href=True):
+        if link['href'].startswith('http') and 'rel' not in link.attrs:
+            link['rel'] = 'nofollow noopener'
+            if 'target' not in link.attrs:
+                link['target'] = '_blank'
+    for img in soup.find_all('img'):
+        src = img.get('src', '')
+        if not src:
+            img.decompose()
+            continue
+        if not src.startswith(('data:', 'http', '/')):
+            img['src'] = f'/media/{src}'
+        img['class'] = img.get('class', []) + ['markdown-image']
+    for video in soup.find_all('video'):
+        for source in video.find_all('source'):
+            src = source.get('src', '')
+            if src and not src.startswith(('data:', 'http', '/')):
+                source['src'] = f'/media/{src}'
+        if 'controls' not in video.attrs:
+            video['controls'] = True
+        video['class'] = video.get('class', []) + ['markdown-video']
+    return str(soup)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-advert Markdown rendering (legacy vs. compiled pipeline vs. render cache) on sample adverts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Number of passes over the sample corpus (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options.get('iterations', 200)
+        bodies = [advert['body_md'] for advert in SAMPLE_ADVERTS]
+
+        results = {}
+        renderers = (
+            ('legacy', legacy_markdown_to_html),
+            ('pipeline', get_markdown_pipeline().render),
+            ('cached', markdown_to_html),
+        )
+        for label, render in renderers:
+            for body in bodies:
+                render(body)  # warm up (imports, pipeline construction, cache fill)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                for body in bodies:
+                    render(body)
+            elapsed = time.perf_counter() - started
+
+            per_advert_ms = elapsed * 1000 / (iterations * len(bodies))
+            results[label] = per_advert_ms
+            self.stdout.write(f'{label:>8}: {per_advert_ms:.3f} ms per advert')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSpeedup: pipeline {results["legacy"] / results["pipeline"]:.2f}x, '
+            f'cached {results["legacy"] / results["cached"]:.2f}x '
+            f'({len(bodies)} adverts x {iterations} iterations)'
+        ))
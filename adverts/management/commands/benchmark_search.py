@@ -0,0 +1,93 @@
+"""
+Management command to benchmark advert search on a synthetic corpus.
+
+Данные создаются внутри транзакции, которая в конце откатывается.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from accounts.models import User
+from adverts.management.commands.load_sample_adverts import SAMPLE_ADVERTS
+from adverts.models import Advert, Category
+from adverts.search import get_search_backend
+from adverts.services import extract_plain_text
+
+QUERIES = ['танка', 'гильдию рейдов', 'эликсиры силы', 'мифрил', 'заклинаниям', 'несуществующееслово']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark icontains vs. full-text search query time on N synthetic adverts (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--adverts',
+            type=int,
+            default=100000,
+            help='Number of synthetic adverts (default: 100000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per query (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        count = options.get('adverts', 100000)
+        repeat = options.get('repeat', 5)
+        backend = get_search_backend()
+
+        with transaction.atomic():
+            self._populate(count)
+            backend.rebuild()
+
+            published = Advert.objects.filter(status=Advert.Status.PUBLISHED)
+            page_size = 15
+
+            def icontains(query):
+                return list(published.filter(
+                    Q(title__icontains=query) | Q(body_md__icontains=query)
+                ).order_by('-created_at')[:page_size])
+
+            def fulltext(query):
+                return list(backend.search(published, query)[:page_size])
+
+            self.stdout.write(f'{count} adverts, {backend.name} backend, first page of {page_size}\n')
+            for label, run in (('icontains', icontains), (backend.name, fulltext)):
+                total = 0.0
+                for query in QUERIES:
+                    started = time.perf_counter()
+                    for _ in range(repeat):
+                        run(query)
+                    elapsed = (time.perf_counter() - started) * 1000 / repeat
+                    total += elapsed
+                    self.stdout.write(f'{label:>10} {query!r:<24} {elapsed:8.2f} ms')
+                self.stdout.write(self.style.SUCCESS(f'{label:>10} average: {total / len(QUERIES):.2f} ms\n'))
+
+            transaction.set_rollback(True)
+
+    def _populate(self, count):
+        user = User.objects.create(email='search-benchmark@example.com', is_active=True)
+        category = Category.objects.create(slug='search-benchmark', name='Search benchmark')
+        rng = random.Random(42)
+
+        samples = [(advert['title'], advert['body_md'], extract_plain_text(advert['body_md'])) for advert in SAMPLE_ADVERTS]
+        batch = []
+        for i in range(count):
+            title, body_md, search_text = rng.choice(samples)
+            batch.append(Advert(
+                author=user,
+                category=category,
+                title=f'{title} #{i}',
+                body_md=body_md,
+                search_text=search_text,
+                status=Advert.Status.PUBLISHED,
+            ))
+            if len(batch) >= 5000:
+                Advert.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Advert.objects.bulk_create(batch)
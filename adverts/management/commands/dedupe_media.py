@@ -0,0 +1,48 @@
+"""
+Management command to collapse duplicate media files by content hash.
+"""
+from django.core.management.base import BaseCommand
+from adverts.media import collapse_duplicate_media
+
+
+class Command(BaseCommand):
+    help = 'Hash stored media files, collapse identical ones onto a single file and report the bytes reclaimed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Assets per batch (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Hashing threads (default: MEDIA_PROCESSING_WORKERS)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report duplicates and reclaimable space, do not change anything',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        stats = collapse_duplicate_media(
+            batch_size=options.get('batch_size', 200),
+            workers=options.get('workers'),
+            dry_run=dry_run,
+        )
+
+        self.stdout.write(f'Hashed {stats["hashed"]} media files.')
+        megabytes = stats['bytes_reclaimed'] / (1024 * 1024)
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'\nFound {stats["groups"]} duplicate groups: {stats["assets_removed"]} assets and '
+                f'{stats["files_removed"]} files can be removed ({megabytes:.2f} МБ).'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'\nCollapsed {stats["groups"]} duplicate groups: removed {stats["assets_removed"]} assets and '
+                f'{stats["files_removed"]} files, reclaimed {stats["bytes_reclaimed"]} bytes ({megabytes:.2f} МБ).'
+            ))
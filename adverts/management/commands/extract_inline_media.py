@@ -0,0 +1,174 @@
+"""
+Management command to move inline base64 media out of adverts into MediaAsset files.
+"""
+import base64
+import binascii
+import hashlib
+import mimetypes
+import re
+import tempfile
+import uuid
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from adverts.forms import ALLOWED_IMAGE_TYPES, ALLOWED_VIDEO_TYPES
+from adverts.media import store_media
+from adverts.models import Advert, MediaAsset
+from adverts.services import markdown_to_html
+
+DATA_URI_RE = re.compile(r'data:(?P<mime>[\w.+-]+/[\w.+-]+);base64,')
+BASE64_PAYLOAD_RE = re.compile(r'[A-Za-z0-9+/]*={0,2}')
+
+# Как при загрузке через форму: остальные типы (SVG со скриптами и т.п.)
+# не выносятся в /media/ и остаются в тексте
+EXTRACTED_TYPES = set(ALLOWED_IMAGE_TYPES + ALLOWED_VIDEO_TYPES)
+
+# Размер куска base64-строки, декодируемого за раз (кратен 4)
+DECODE_CHUNK_SIZE = 64 * 1024 * 4
+
+
+class Command(BaseCommand):
+    help = 'Extract base64 data: URIs from adverts into MediaAsset files and reference them by /media/ URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--advert-id',
+            type=int,
+            help='Process specific advert ID',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report adverts with inline media, do not change anything',
+        )
+
+    def handle(self, *args, **options):
+        advert_id = options.get('advert_id')
+        dry_run = options.get('dry_run', False)
+
+        queryset = Advert.objects.filter(body_md__contains='data:')
+        if advert_id:
+            queryset = queryset.filter(pk=advert_id)
+
+        # Load only ids up front; bodies are fetched one advert at a time
+        advert_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+
+        if not advert_ids:
+            self.stdout.write(self.style.WARNING('No adverts with inline media found.'))
+            return
+
+        extracted_total = 0
+        bytes_total = 0
+        failed = 0
+
+        for pk in advert_ids:
+            advert = Advert.objects.only('pk', 'author_id', 'title', 'body_md').get(pk=pk)
+
+            skipped = sorted({
+                mime for _, _, _, mime in self._iter_data_uris(advert.body_md) if mime not in EXTRACTED_TYPES
+            })
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'Advert {pk}: unsupported inline media left as is ({", ".join(skipped)})'
+                ))
+
+            if dry_run:
+                count = sum(1 for *_, mime in self._iter_data_uris(advert.body_md) if mime in EXTRACTED_TYPES)
+                self.stdout.write(f'Advert {pk}: {count} inline media')
+                extracted_total += count
+                continue
+
+            try:
+                with transaction.atomic():
+                    assets = []
+                    created_files = []
+                    try:
+                        body_md = self._extract(advert, assets, created_files)
+                    except Exception:
+                        # Не оставляем файлы без записей в БД (общие файлы не трогаем)
+                        for name in created_files:
+                            MediaAsset.file.field.storage.delete(name)
+                        raise
+
+                    if not assets:
+                        continue
+
+                    advert.body_md = body_md
+                    advert.body_html = markdown_to_html(body_md)
+                    # updated_at входит в ключи фрагментов и ETag страницы объявления
+                    advert.save(update_fields=['body_md', 'body_html', 'search_text', 'excerpt', 'thumbnail', 'updated_at'])
+            except (binascii.Error, ValueError) as exc:
+                # Битый base64 в одном объявлении не должен останавливать остальные
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'Advert {pk}: invalid inline media, skipped ({exc})'))
+                continue
+
+            extracted_total += len(assets)
+            bytes_total += sum(asset.size for asset in assets)
+            self.stdout.write(self.style.SUCCESS(f'Advert {pk}: extracted {len(assets)} media files'))
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'\nFound {extracted_total} inline media in {len(advert_ids)} adverts.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'\nExtracted {extracted_total} media files ({bytes_total / (1024 * 1024):.2f} МБ).'
+            ))
+            if failed:
+                self.stdout.write(self.style.WARNING(f'Skipped {failed} adverts with invalid inline media.'))
+
+    def _iter_data_uris(self, body_md):
+        """Yield (start, payload_start, payload_end, mime) for image/video data: URIs."""
+        pos = 0
+        while True:
+            match = DATA_URI_RE.search(body_md, pos)
+            if not match:
+                return
+            payload = BASE64_PAYLOAD_RE.match(body_md, match.end())
+            pos = payload.end()
+            mime = match.group('mime')
+            if mime.startswith(('image/', 'video/')) and payload.end() > payload.start():
+                yield match.start(), payload.start(), payload.end(), mime
+
+    def _extract(self, advert, assets, created_files):
+        """Store every supported data: URI of the advert as MediaAsset and return the rewritten Markdown."""
+        body_md = advert.body_md
+        parts = []
+        last = 0
+
+        for start, payload_start, payload_end, mime in self._iter_data_uris(body_md):
+            if mime not in EXTRACTED_TYPES:
+                continue
+            asset, file_created = self._store_payload(advert, body_md, payload_start, payload_end, mime)
+            assets.append(asset)
+            if file_created:
+                created_files.append(asset.file.name)
+            parts.append(body_md[last:start])
+            parts.append(asset.file.url)
+            last = payload_end
+
+        parts.append(body_md[last:])
+        return ''.join(parts)
+
+    def _store_payload(self, advert, body_md, payload_start, payload_end, mime):
+        """
+        Decode base64 payload chunk by chunk into a temporary file and save it as MediaAsset.
+
+        Returns (asset, file_created) of adverts.media.store_media.
+        """
+        media_type = MediaAsset.VIDEO if mime.startswith('video/') else MediaAsset.IMAGE
+        extension = mimetypes.guess_extension(mime) or ''
+        filename = f'{uuid.uuid4().hex}{extension}'
+
+        with tempfile.TemporaryFile() as tmp:
+            hasher = hashlib.sha256()
+            for chunk_start in range(payload_start, payload_end, DECODE_CHUNK_SIZE):
+                chunk_end = min(chunk_start + DECODE_CHUNK_SIZE, payload_end)
+                chunk = base64.b64decode(body_md[chunk_start:chunk_end])
+                hasher.update(chunk)
+                tmp.write(chunk)
+            tmp.seek(0)
+
+            upload = File(tmp, name=filename)
+            upload.content_hash = hasher.hexdigest()
+            return store_media(advert.author_id, upload, media_type, mime)
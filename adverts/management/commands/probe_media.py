@@ -0,0 +1,38 @@
+"""
+Management command to backfill MediaAsset metadata from file headers.
+"""
+from django.core.management.base import BaseCommand
+from adverts.media import backfill_media_metadata
+
+
+class Command(BaseCommand):
+    help = 'Fill missing size, MIME type, resolution and video duration of media assets in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Assets per batch (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Probe threads (default: MEDIA_PROCESSING_WORKERS)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-probe every asset, not only those with missing metadata',
+        )
+
+    def handle(self, *args, **options):
+        checked = updated = 0
+        for checked, updated in backfill_media_metadata(
+            batch_size=options.get('batch_size', 200),
+            workers=options.get('workers'),
+            reprobe=options.get('all', False),
+        ):
+            self.stdout.write(f'Checked {checked} assets...')
+
+        self.stdout.write(self.style.SUCCESS(f'\nMetadata updated for {updated} of {checked} assets.'))
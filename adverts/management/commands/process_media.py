@@ -0,0 +1,48 @@
+"""
+Management command to build derived media (image variants, video posters) for MediaAsset files.
+"""
+from django.core.management.base import BaseCommand
+from adverts.media import process_pending_media
+from adverts.models import MediaAsset
+
+
+class Command(BaseCommand):
+    help = 'Build resized WebP/JPEG image variants and video posters for pending assets (backfill; run_worker handles new uploads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Assets claimed per batch (default: 50)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Encoding threads (default: MEDIA_PROCESSING_WORKERS)',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also reprocess assets that failed before',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('retry_failed'):
+            MediaAsset.objects.filter(
+                processing_status=MediaAsset.ProcessingStatus.FAILED
+            ).update(processing_status=MediaAsset.ProcessingStatus.PENDING, processed_at=None)
+
+        ready = failed = 0
+        while True:
+            batch_ready, batch_failed = process_pending_media(
+                limit=options.get('batch_size', 50),
+                workers=options.get('workers'),
+            )
+            if not batch_ready and not batch_failed:
+                break
+            ready += batch_ready
+            failed += batch_failed
+            self.stdout.write(f'Processed {ready + failed} assets...')
+
+        self.stdout.write(self.style.SUCCESS(f'\nProcessed media ready for {ready} assets, {failed} failed.'))
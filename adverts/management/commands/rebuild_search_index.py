@@ -0,0 +1,50 @@
+"""
+Management command to backfill Advert.search_text and rebuild the full-text search index.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from adverts.models import Advert
+from adverts.search import get_search_backend
+from adverts.services import extract_plain_text
+
+
+class Command(BaseCommand):
+    help = 'Recompute plain-text search fields for all adverts and rebuild the search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Adverts per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size', 500)
+        backend = get_search_backend()
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Advert.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'body_md', 'search_text')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for advert in batch:
+                advert.search_text = extract_plain_text(advert.body_md)
+            Advert.objects.bulk_update(batch, ['search_text'])
+
+            updated += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Processed {updated} adverts...')
+
+        with transaction.atomic():
+            backend.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSearch index rebuilt ({backend.name} backend, {updated} adverts).'
+        ))
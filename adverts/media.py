@@ -0,0 +1,741 @@
+"""
+Media processing for MediaAsset: content-addressed storage, metadata
+probing, resized image variants for srcset and video poster frames.
+
+Метаданные читаются только из заголовков (изображение не декодируется,
+из файла читается не больше MEDIA_PROBE_READ_BUDGET байт). Варианты
+создаются один раз на файл фоновым обработчиком (adverts.tasks), а не в
+MediaAsset.save(): загрузка не ждёт перекодирования, а страницы до
+готовности вариантов показывают оригинал (видео - без постера).
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger('adverts')
+
+DEFAULT_IMAGE_VARIANTS = {
+    'thumb': {'widths': [120, 240], 'sizes': '120px'},
+    'detail': {'widths': [800, 1600], 'sizes': '(max-width: 840px) 100vw, 800px'},
+}
+
+# Формат -> (формат PIL, расширение, MIME-тип)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'png': ('PNG', 'png', 'image/png'),
+}
+
+VARIANTS_CACHE_KEY = 'media:variants:{digest}'
+POSTER_CACHE_KEY = 'media:poster:{digest}'
+
+
+# Поля, которые зависят только от содержимого файла и копируются вместе с ним
+CONTENT_FIELDS = (
+    'mime', 'size', 'width', 'height', 'duration', 'poster',
+    'variants', 'processing_status', 'processed_at',
+)
+
+
+def content_hash_of(file):
+    """
+    Hex SHA-256 of a file.
+    
+    Загрузки через обработчики adverts.uploadhandlers уже несут хэш,
+    посчитанный при приёме; иначе файл читается по кускам (не целиком).
+    """
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def copy_content_fields(target, source):
+    """Point target at the file of source, together with its metadata and derived media."""
+    target.file.name = source.file.name
+    for field in CONTENT_FIELDS:
+        setattr(target, field, getattr(source, field))
+
+
+def store_media(owner_id, upload, media_type, mime):
+    """
+    Save an upload as MediaAsset, reusing stored files with the same content.
+    
+    Повторная загрузка того же файла пользователем возвращает его прежний
+    актив; тот же файл другого пользователя даёт новую запись (у каждого
+    свой владелец) без новой копии на диске. Returns (asset, file_created):
+    file_created - был ли записан новый файл в хранилище.
+    """
+    from .models import MediaAsset
+
+    content_hash = content_hash_of(upload)
+    existing = MediaAsset.objects.filter(owner_id=owner_id, content_hash=content_hash).first()
+    if existing is not None:
+        return existing, False
+
+    asset = MediaAsset(owner_id=owner_id, type=media_type, mime=mime, content_hash=content_hash)
+    source = MediaAsset.objects.filter(content_hash=content_hash).order_by('pk').first()
+    file_created = source is None or not source.file.storage.exists(source.file.name)
+    if file_created:
+        asset.file = upload
+    else:
+        copy_content_fields(asset, source)
+
+    try:
+        with transaction.atomic():
+            asset.save()
+    except IntegrityError:
+        # Тот же файл тем же пользователем параллельно: побеждает первая запись
+        if file_created and asset.file.name:
+            asset.file.storage.delete(asset.file.name)
+        return MediaAsset.objects.get(owner_id=owner_id, content_hash=content_hash), False
+    return asset, file_created
+
+
+def probe_image(fileobj, budget=None):
+    """
+    Read width, height and MIME type of an image from its header.
+    
+    Читается не больше budget байт с начала файла (заголовок JPEG с EXIF
+    и ICC-профилем умещается с запасом); пиксели не декодируются. Позиция
+    файла восстанавливается. Returns {} if the header is not recognized.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    budget = budget or getattr(settings, 'MEDIA_PROBE_READ_BUDGET', 512 * 1024)
+    position = fileobj.tell() if hasattr(fileobj, 'tell') else 0
+    try:
+        fileobj.seek(0)
+        head = fileobj.read(budget)
+    finally:
+        fileobj.seek(position)
+
+    try:
+        with Image.open(BytesIO(head)) as image:
+            width, height = image.size
+            mime = image.get_format_mimetype() or ''
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning('Image header probe failed: %s', exc)
+        return {}
+    return {'width': width, 'height': height, 'mime': mime}
+
+
+def probe_video(path):
+    """
+    Read width, height and duration of a video from its container metadata (OpenCV).
+    
+    Кадры не декодируются: число кадров и FPS берутся из заголовков
+    контейнера. Returns {} if OpenCV cannot open the file.
+    """
+    import cv2
+
+    capture = cv2.VideoCapture(str(path))
+    try:
+        if not capture.isOpened():
+            return {}
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        fps = capture.get(cv2.CAP_PROP_FPS)
+    finally:
+        capture.release()
+
+    metadata = {}
+    if width > 0 and height > 0:
+        metadata.update(width=width, height=height)
+    if frames > 0 and fps > 0:
+        metadata['duration'] = round(frames / fps, 3)
+    return metadata
+
+
+def local_media_path(file):
+    """Filesystem path of a FieldFile (stored file or temporary upload), or None if it is only in memory."""
+    if not file._committed:
+        upload = file.file
+        return upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else None
+    try:
+        return file.path
+    except NotImplementedError:
+        # Хранилище без локальных путей (S3 и т.п.)
+        return None
+
+
+def probe_media(asset):
+    """
+    Probe metadata of asset.file (a stored file or a not yet saved upload).
+    
+    Видео читается OpenCV только с диска: загрузка, которая целиком в памяти,
+    пропускается - её метаданные заполнит команда probe_media.
+    Returns a dict of MediaAsset fields to set.
+    """
+    file = asset.file
+    if asset.type == asset.IMAGE:
+        if not file._committed:
+            return probe_image(file)
+        with file.open('rb'):
+            return probe_image(file)
+    path = local_media_path(file)
+    return probe_video(path) if path else {}
+
+
+def _probe_in_worker(asset):
+    try:
+        metadata = probe_media(asset)
+        if not asset.size:
+            metadata['size'] = asset.file.size
+        return metadata
+    except Exception as exc:
+        # Одна битая запись не должна останавливать пересчёт всех файлов
+        logger.warning('Metadata probe failed for MediaAsset %s: %s', asset.pk, exc)
+        return {}
+
+
+def backfill_media_metadata(batch_size=200, workers=None, reprobe=False):
+    """
+    Probe metadata of existing assets in a thread pool, batch by batch of ids.
+    
+    Без reprobe берутся только файлы с пустыми mime/size/размерами (и длительностью
+    для видео). Чтение файлов и OpenCV отпускают GIL; запись в БД - один
+    bulk_update на пачку в вызывающем потоке. Yields (checked, updated) after each batch.
+    """
+    from .models import MediaAsset
+
+    queryset = MediaAsset.objects.all()
+    if not reprobe:
+        queryset = queryset.filter(
+            Q(mime='') | Q(size=0) | Q(width__isnull=True)
+            | Q(type=MediaAsset.VIDEO, duration__isnull=True)
+        )
+
+    workers = workers or getattr(settings, 'MEDIA_PROCESSING_WORKERS', 2)
+    checked = updated = 0
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+
+            changed_assets = []
+            fields = set()
+            for asset, metadata in zip(batch, pool.map(_probe_in_worker, batch)):
+                changed = asset.apply_metadata(metadata)
+                if changed:
+                    changed_assets.append(asset)
+                    fields.update(changed)
+            if changed_assets:
+                MediaAsset.objects.bulk_update(changed_assets, sorted(fields))
+
+            checked += len(batch)
+            updated += len(changed_assets)
+            yield checked, updated
+
+
+def get_variant_presets():
+    return getattr(settings, 'MEDIA_IMAGE_VARIANTS', DEFAULT_IMAGE_VARIANTS)
+
+
+def variant_widths(original_width):
+    """Target widths of all presets, capped at the original width (no upscaling)."""
+    widths = {
+        min(width, original_width)
+        for preset in get_variant_presets().values()
+        for width in preset['widths']
+    }
+    return sorted(widths)
+
+
+def build_image_variants(asset):
+    """
+    Resize the image of asset to every preset width and store WebP and JPEG
+    (PNG for images with transparency) copies next to the original.
+
+    Returns the value for MediaAsset.variants; {} for images that are kept
+    as is (анимация). Touches only storage, so it is safe to run in a thread pool.
+    """
+    from PIL import Image, ImageOps
+
+    quality = getattr(settings, 'MEDIA_IMAGE_VARIANT_QUALITY', 80)
+    storage = asset.file.storage
+    stem = os.path.splitext(asset.file.name)[0]
+
+    with asset.file.open('rb') as source, Image.open(source) as image:
+        if getattr(image, 'is_animated', False):
+            # Кадр анимации вместо анимации хуже оригинала
+            return {}
+
+        # JPEG декодируется сразу в уменьшенном масштабе, если крупнее 2x не нужно
+        largest = max(width for preset in get_variant_presets().values() for width in preset['widths'])
+        image.draft('RGB', (largest, largest * image.height // max(image.width, 1)))
+
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        fallback = 'png' if has_alpha else 'jpeg'
+        image = ImageOps.exif_transpose(image).convert('RGBA' if has_alpha else 'RGB')
+
+        variants = {'width': image.width, 'webp': {}, fallback: {}}
+        for width in variant_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize(
+                (width, height), Image.LANCZOS, reducing_gap=3.0
+            )
+            for format_name in ('webp', fallback):
+                pil_format, extension, _ = VARIANT_FORMATS[format_name]
+                buffer = BytesIO()
+                resized.save(buffer, pil_format, quality=quality, optimize=True)
+                name = storage.save(f'{stem}.{width}w.{extension}', ContentFile(buffer.getvalue()))
+                variants[format_name][str(width)] = name
+
+    return variants
+
+
+def extract_video_poster(asset):
+    """
+    Grab a representative frame of a video into a JPEG poster next to the original.
+    
+    Кадр берётся на 10%, 25% или 50% длительности: первый достаточно светлый
+    (начало ролика часто чёрное), иначе самый светлый из прочитанных.
+    OpenCV декодирует только от ближайшего ключевого кадра. Returns
+    {'poster': name, 'width', 'height', 'duration'}, {} without a readable frame.
+    """
+    import cv2
+    from PIL import Image
+
+    path = local_media_path(asset.file)
+    if path is None:
+        logger.warning('MediaAsset %s is not on local disk, poster skipped', asset.pk)
+        return {}
+
+    metadata = probe_video(path)
+    min_brightness = getattr(settings, 'MEDIA_VIDEO_POSTER_MIN_BRIGHTNESS', 40)
+    best = None
+    capture = cv2.VideoCapture(str(path))
+    try:
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        # Без числа кадров (часть WebM) перемотка невозможна - берём первый кадр
+        positions = [int(frames * fraction) for fraction in (0.1, 0.25, 0.5)] if frames > 0 else [None]
+        for position in positions:
+            if position is not None:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ok, frame = capture.read()
+            if not ok:
+                continue
+            brightness = float(frame.mean())
+            if best is None or brightness > best[0]:
+                best = (brightness, frame)
+            if brightness >= min_brightness:
+                break
+    finally:
+        capture.release()
+
+    if best is None:
+        return metadata
+
+    image = Image.fromarray(cv2.cvtColor(best[1], cv2.COLOR_BGR2RGB))
+    max_width = getattr(settings, 'MEDIA_VIDEO_POSTER_WIDTH', 1280)
+    if image.width > max_width:
+        image = image.resize((max_width, max(1, round(image.height * max_width / image.width))), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=getattr(settings, 'MEDIA_IMAGE_VARIANT_QUALITY', 80), optimize=True)
+    stem = os.path.splitext(asset.file.name)[0]
+    metadata['poster'] = asset.file.storage.save(f'{stem}.poster.jpg', ContentFile(buffer.getvalue()))
+    return metadata
+
+
+def _name_digest(name):
+    return hashlib.md5(name.encode('utf-8')).hexdigest()
+
+
+def _variants_cache_key(name):
+    return VARIANTS_CACHE_KEY.format(digest=_name_digest(name))
+
+
+def media_name_from_url(url):
+    """Storage name for a /media/ URL, or None for external and data: URLs."""
+    media_url = settings.MEDIA_URL
+    if not url or not url.startswith(media_url):
+        return None
+    return unquote(url[len(media_url):])
+
+
+def get_image_variants(urls):
+    """
+    Return {url: variants} for the given /media/ URLs (missing or not yet
+    processed files map to {}).
+
+    Кэшируется по пути файла; один запрос к БД на все промахи кэша.
+    """
+    from .models import MediaAsset
+
+    names = {url: media_name_from_url(url) for url in set(urls) if url}
+    names = {url: name for url, name in names.items() if name}
+    if not names:
+        return {}
+
+    keys = {name: _variants_cache_key(name) for name in names.values()}
+    cached = cache.get_many(keys.values())
+    found = {name: cached[key] for name, key in keys.items() if key in cached}
+
+    missing = [name for name in keys if name not in found]
+    if missing:
+        loaded = dict(
+            MediaAsset.objects.filter(
+                file__in=missing, processing_status=MediaAsset.ProcessingStatus.READY
+            ).values_list('file', 'variants')
+        )
+        for name in missing:
+            found[name] = loaded.get(name) or {}
+        cache.set_many({keys[name]: found[name] for name in missing})
+
+    return {url: found[name] for url, name in names.items()}
+
+
+def get_video_posters(urls):
+    """
+    Return {url: poster URL} for the given /media/ video URLs ('' if there is no poster yet).
+    
+    Кэшируется по пути файла; один запрос к БД на все промахи кэша.
+    """
+    from .models import MediaAsset
+
+    names = {url: media_name_from_url(url) for url in set(urls) if url}
+    names = {url: name for url, name in names.items() if name}
+    if not names:
+        return {}
+
+    keys = {name: POSTER_CACHE_KEY.format(digest=_name_digest(name)) for name in names.values()}
+    cached = cache.get_many(keys.values())
+    found = {name: cached[key] for name, key in keys.items() if key in cached}
+
+    missing = [name for name in keys if name not in found]
+    if missing:
+        loaded = dict(
+            MediaAsset.objects.filter(
+                file__in=missing, type=MediaAsset.VIDEO, processing_status=MediaAsset.ProcessingStatus.READY
+            ).exclude(poster='').exclude(poster__isnull=True).values_list('file', 'poster')
+        )
+        for name in missing:
+            found[name] = f'{settings.MEDIA_URL}{loaded[name]}' if loaded.get(name) else ''
+        cache.set_many({keys[name]: found[name] for name in missing})
+
+    return {url: found[name] for url, name in names.items()}
+
+
+def get_srcset(variants, preset, format_name=None):
+    """srcset string for a preset of variants; format defaults to the fallback (JPEG/PNG)."""
+    if not variants:
+        return ''
+    if format_name is None:
+        format_name = 'png' if 'png' in variants else 'jpeg'
+    files = variants.get(format_name) or {}
+    widths = sorted({min(width, variants['width']) for width in get_variant_presets()[preset]['widths']})
+    return ', '.join(
+        f'{settings.MEDIA_URL}{files[str(width)]} {width}w'
+        for width in widths if str(width) in files
+    )
+
+
+def refresh_advert_fragments(asset):
+    """Drop cached detail fragments of adverts that embed the asset file, so srcset appears."""
+    from .models import Advert, MediaAsset
+    from .services import detail_fragment_keys
+
+    # Файл может быть общим для записей разных владельцев
+    owners = MediaAsset.objects.filter(file=asset.file.name).values('owner_id')
+    # body_md хранит file.url (кириллица закодирована), поэтому ищем и URL, и имя
+    adverts = Advert.objects.filter(
+        references_query(asset.file.name), author_id__in=owners
+    ).values('id', 'updated_at')
+    keys = [key for meta in adverts for key in detail_fragment_keys(meta)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def claim_pending_assets(asset_ids=None, limit=None):
+    """
+    Claim pending (or abandoned) media assets for processing.
+
+    Условный UPDATE по статусу: актив обрабатывает только тот, кто его
+    перевёл в processing. Файл может быть общим для нескольких записей
+    (adverts.media.store_media): вместе с записью забираются остальные записи
+    на тот же файл, а файл, который уже обрабатывается, пропускается -
+    результат process_assets получают все записи файла.
+    Returns the claimed MediaAsset objects, one per file.
+    """
+    from .models import MediaAsset
+
+    Status = MediaAsset.ProcessingStatus
+    lease = timezone.now() - timedelta(seconds=getattr(settings, 'MEDIA_PROCESSING_LEASE', 10 * 60))
+    claimable = (
+        Q(processing_status=Status.PENDING)
+        | Q(processing_status=Status.PROCESSING, processed_at__lt=lease)
+    )
+    queryset = MediaAsset.objects.filter(claimable)
+    if asset_ids is not None:
+        queryset = queryset.filter(pk__in=asset_ids)
+
+    candidates = list(queryset.order_by('pk').values_list('pk', 'file', 'processing_status', 'processed_at')[:limit])
+    busy = set(MediaAsset.objects.filter(
+        file__in={name for _, name, _, _ in candidates},
+        processing_status=Status.PROCESSING,
+        processed_at__gte=lease,
+    ).values_list('file', flat=True))
+    claimed = []
+    now = timezone.now()
+    for pk, name, status, processed_at in candidates:
+        if name in busy:
+            continue
+        busy.add(name)
+        if MediaAsset.objects.filter(pk=pk, processing_status=status, processed_at=processed_at).update(
+            processing_status=Status.PROCESSING, processed_at=now
+        ):
+            MediaAsset.objects.filter(claimable, file=name).exclude(pk=pk).update(
+                processing_status=Status.PROCESSING, processed_at=now
+            )
+            claimed.append(pk)
+    return list(MediaAsset.objects.filter(pk__in=claimed).order_by('pk'))
+
+
+def _process_in_worker(asset):
+    """Build derived media of one asset; returns (fields to update, error)."""
+    try:
+        if asset.type == asset.VIDEO:
+            return extract_video_poster(asset), None
+        return {'variants': build_image_variants(asset)}, None
+    except Exception as exc:
+        return None, exc
+
+
+def process_assets(assets, workers=None):
+    """
+    Build derived media of claimed assets in a thread pool and save the results.
+    
+    Изображения - варианты для srcset, видео - постер и длительность.
+    Пиксельная работа PIL и OpenCV отпускает GIL, поэтому потоки дают выигрыш;
+    запись в БД остаётся в вызывающем потоке. Returns (ready, failed).
+    """
+    from .models import MediaAsset
+
+    Status = MediaAsset.ProcessingStatus
+    workers = workers or getattr(settings, 'MEDIA_PROCESSING_WORKERS', 2)
+    ready = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for asset, (fields, error) in zip(assets, pool.map(_process_in_worker, assets)):
+            if error is not None:
+                logger.warning('Processing failed for MediaAsset %s: %s', asset.pk, error)
+                status = Status.FAILED
+                fields = {}
+                failed += 1
+            else:
+                status = Status.READY
+                ready += 1
+            # Результат общий для всех записей на этот файл
+            MediaAsset.objects.filter(Q(pk=asset.pk) | Q(file=asset.file.name)).update(
+                **fields, processing_status=status, processed_at=timezone.now()
+            )
+            digest = _name_digest(asset.file.name)
+            cache.delete_many([VARIANTS_CACHE_KEY.format(digest=digest), POSTER_CACHE_KEY.format(digest=digest)])
+            if fields.get('variants') or fields.get('poster'):
+                refresh_advert_fragments(asset)
+    return ready, failed
+
+
+def process_pending_media(limit=None, workers=None, asset_ids=None):
+    """Claim and process pending media assets. Returns (ready, failed)."""
+    limit = limit or getattr(settings, 'MEDIA_PROCESSING_BATCH_SIZE', 20)
+    assets = claim_pending_assets(asset_ids=asset_ids, limit=limit)
+    if not assets:
+        return 0, 0
+    return process_assets(assets, workers=workers)
+
+
+def _hash_in_worker(asset):
+    """Content hash of a stored asset file, or None if the file is missing or unreadable."""
+    try:
+        with asset.file.open('rb'):
+            return content_hash_of(asset.file)
+    except Exception as exc:
+        logger.warning('Hashing failed for MediaAsset %s: %s', asset.pk, exc)
+        return None
+
+
+def _derived_names(asset):
+    """Storage names of the resized variants and poster built for the asset file."""
+    names = [
+        name
+        for format_name, files in (asset.variants or {}).items()
+        if format_name in VARIANT_FORMATS
+        for name in files.values()
+    ]
+    if asset.poster:
+        names.append(asset.poster.name)
+    return names
+
+
+def _stored_size(storage, name):
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
+
+
+def media_references(name):
+    """
+    Forms in which a stored file can appear in advert Markdown.
+    
+    Формы вставляют file.url - путь закодирован (%D0%B3... для кириллицы);
+    старые тексты могут содержать и сырое имя. Returns (url, name), URL first.
+    """
+    from .models import MediaAsset
+
+    url = MediaAsset.file.field.storage.url(name)
+    return (url, name) if url != name else (name,)
+
+
+def references_query(name):
+    """Q for adverts whose Markdown references the stored file in any form."""
+    query = Q()
+    for reference in media_references(name):
+        query |= Q(body_md__contains=reference)
+    return query
+
+
+def _relink_adverts(owner_ids, renames):
+    """Replace old media paths with the kept ones in Markdown of the owners' adverts."""
+    from .models import Advert
+    from .services import markdown_to_html
+
+    query = Q()
+    for old_name in renames:
+        query |= references_query(old_name)
+    for advert in Advert.objects.filter(query, author_id__in=owner_ids).only('pk', 'title', 'body_md'):
+        body_md = advert.body_md
+        for old_name, new_name in renames.items():
+            # Сначала URL: сырое имя - его подстрока, если имя без спецсимволов
+            for old, new in zip(media_references(old_name), media_references(new_name)):
+                body_md = body_md.replace(old, new)
+        advert.body_md = body_md
+        advert.body_html = markdown_to_html(body_md)
+        advert.save(update_fields=['body_md', 'body_html', 'search_text', 'excerpt', 'thumbnail', 'updated_at'])
+
+
+def collapse_duplicate_media(batch_size=200, workers=None, dry_run=False):
+    """
+    Collapse media assets with identical content onto one stored file.
+    
+    Файлы без хэша хэшируются в пуле потоков (чтение по кускам отпускает GIL).
+    Для каждого содержимого остаётся файл самой ранней записи: записи других
+    владельцев переводятся на него, лишние записи того же владельца удаляются,
+    ссылки в Markdown объявлений переписываются, а ставшие ненужными файлы
+    удаляются вместе с вариантами и постерами.
+    Returns a dict with the numbers of hashed assets, duplicate groups,
+    removed assets and files and the bytes reclaimed.
+    """
+    from .models import Advert, MediaAsset
+
+    storage = MediaAsset.file.field.storage
+    workers = workers or getattr(settings, 'MEDIA_PROCESSING_WORKERS', 2)
+    stats = {'hashed': 0, 'groups': 0, 'assets_removed': 0, 'files_removed': 0, 'bytes_reclaimed': 0}
+
+    # 1. Хэши старых файлов; в БД они пишутся после объединения
+    # (у дублей одного владельца одинаковый хэш нарушил бы ограничение уникальности)
+    hashes = {}
+    unhashed = MediaAsset.objects.filter(content_hash='').only('pk', 'file')
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(unhashed.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for asset, content_hash in zip(batch, pool.map(_hash_in_worker, batch)):
+                if content_hash:
+                    hashes[asset.pk] = content_hash
+    stats['hashed'] = len(hashes)
+
+    # 2. Группы записей с одинаковым содержимым
+    groups = {}
+    rows = MediaAsset.objects.filter(Q(pk__in=hashes) | ~Q(content_hash='')).order_by('pk').values_list(
+        'pk', 'owner_id', 'file', 'content_hash'
+    ).iterator(chunk_size=batch_size)
+    for pk, owner_id, name, content_hash in rows:
+        groups.setdefault(content_hash or hashes[pk], []).append((pk, owner_id, name))
+
+    for content_hash, members in groups.items():
+        names = {name for _, _, name in members}
+        owners = {owner_id for _, owner_id, _ in members}
+        if len(names) == 1 and len(owners) == len(members):
+            continue
+        # Остаётся файл самой ранней записи (members упорядочены по pk)
+        keep_name = next((name for _, _, name in members if storage.exists(name)), None)
+        if keep_name is None:
+            continue
+        stats['groups'] += 1
+
+        kept = {}
+        for pk, owner_id, name in members:
+            kept.setdefault(owner_id, pk)
+        removed_pks = [pk for pk, owner_id, _ in members if kept[owner_id] != pk]
+        stale = [
+            MediaAsset.objects.only('file', 'variants', 'poster').filter(file=name).first()
+            for name in names - {keep_name}
+        ]
+        stats['assets_removed'] += len(removed_pks)
+        if not dry_run:
+            source = MediaAsset.objects.filter(file=keep_name).order_by('pk').first()
+            with transaction.atomic():
+                MediaAsset.objects.filter(pk__in=removed_pks).delete()
+                MediaAsset.objects.filter(pk__in=kept.values()).update(
+                    file=keep_name,
+                    content_hash=content_hash,
+                    **{field: getattr(source, field) for field in CONTENT_FIELDS},
+                )
+                renames = {asset.file.name: keep_name for asset in stale}
+                if renames:
+                    _relink_adverts(owners, renames)
+
+        for asset in stale:
+            # Файл удаляется, только если на него не ссылается ни одно объявление
+            # (чужое объявление со вставленной ссылкой relink не переписывает)
+            in_use = Advert.objects.filter(references_query(asset.file.name))
+            if dry_run:
+                in_use = in_use.exclude(author_id__in=owners)
+            if in_use.exists():
+                logger.warning('Duplicate media file %s is still referenced by adverts, kept', asset.file.name)
+                continue
+            stale_files = [asset.file.name, *_derived_names(asset)]
+            stats['files_removed'] += 1
+            stats['bytes_reclaimed'] += sum(_stored_size(storage, name) for name in stale_files)
+            if not dry_run:
+                for name in stale_files:
+                    storage.delete(name)
+        if dry_run:
+            continue
+        for pk in removed_pks:
+            hashes.pop(pk, None)
+        for pk in kept.values():
+            hashes.pop(pk, None)
+
+    # 3. Хэши файлов без дублей
+    if not dry_run and hashes:
+        MediaAsset.objects.bulk_update(
+            [MediaAsset(pk=pk, content_hash=content_hash) for pk, content_hash in hashes.items()],
+            ['content_hash'],
+            batch_size=batch_size,
+        )
+    return stats
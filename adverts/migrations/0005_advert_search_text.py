@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+FTS_TABLE = 'adverts_advert_fts'
+# Зафиксировано здесь, а не читается из настроек: запросы используют
+# ту же конфигурацию (adverts.search.SEARCH_CONFIG)
+SEARCH_CONFIG = 'russian'
+
+
+def create_search_index(apps, schema_editor):
+    """Create vendor-specific full-text search structures (see adverts.search)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        config = SEARCH_CONFIG
+        schema_editor.execute(
+            "ALTER TABLE adverts_advert ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{config}'::regconfig, coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{config}'::regconfig, coalesce(search_text, '')), 'B')"
+            ") STORED"
+        )
+        schema_editor.execute(
+            'CREATE INDEX adverts_advert_search_vector_gin ON adverts_advert USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite собран без FTS5 - будет использоваться BasicSearchBackend
+            pass
+
+
+def backfill_search_index(apps, schema_editor):
+    """Fill search_text of existing adverts and load them into the FTS5 table."""
+    from adverts.services import extract_plain_text
+
+    Advert = apps.get_model('adverts', 'Advert')
+    last_pk = 0
+    while True:
+        batch = list(Advert.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'body_md')[:500])
+        if not batch:
+            break
+        for advert in batch:
+            advert.search_text = extract_plain_text(advert.body_md)
+        Advert.objects.bulk_update(batch, ['search_text'])
+        last_pk = batch[-1].pk
+
+    # PostgreSQL пересчитывает search_vector сам (GENERATED ... STORED)
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, body) SELECT id, title, search_text FROM adverts_advert'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS adverts_advert_search_vector_gin')
+        schema_editor.execute('ALTER TABLE adverts_advert DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0004_alter_mediaasset_file_alter_mediaasset_owner_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advert',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, help_text='Текст объявления без разметки и медиа (заполняется автоматически)', verbose_name='Текст для поиска'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0005_advert_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advert',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Начало текста без разметки для списка объявлений (заполняется автоматически)', verbose_name='Анонс'),
+        ),
+        migrations.AddField(
+            model_name='advert',
+            name='thumbnail',
+            field=models.CharField(blank=True, editable=False, help_text='URL первого изображения объявления (заполняется автоматически)', max_length=500, verbose_name='Превью'),
+        ),
+    ]
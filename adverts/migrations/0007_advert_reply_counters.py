@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:03
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_reply_counters(apps, schema_editor):
+    """Count existing replies per advert, as replies.services.reconcile_reply_counters does."""
+    Advert = apps.get_model('adverts', 'Advert')
+    Reply = apps.get_model('replies', 'Reply')
+
+    def count(*statuses):
+        replies = Reply.objects.filter(advert=models.OuterRef('pk'), status__in=statuses).order_by()
+        return Coalesce(
+            models.Subquery(replies.values('advert').annotate(count=models.Count('pk')).values('count')),
+            0,
+        )
+
+    last_id = 0
+    while True:
+        ids = list(Advert.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:1000])
+        if not ids:
+            return
+        last_id = ids[-1]
+        Advert.objects.filter(pk__in=ids).update(
+            replies_count=count('pending', 'accepted'),
+            pending_replies_count=count('pending'),
+            accepted_replies_count=count('accepted'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0006_advert_excerpt_thumbnail'),
+        ('replies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advert',
+            name='accepted_replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов принято'),
+        ),
+        migrations.AddField(
+            model_name='advert',
+            name='pending_replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов ожидает'),
+        ),
+        migrations.AddField(
+            model_name='advert',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов'),
+        ),
+        # Без пересчёта уменьшение счётчика у старых откликов нарушило бы CHECK (>= 0)
+        migrations.RunPython(backfill_reply_counters, migrations.RunPython.noop),
+    ]
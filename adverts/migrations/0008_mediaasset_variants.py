@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+import adverts.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0007_advert_reply_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaasset',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Обработано'),
+        ),
+        migrations.AddField(
+            model_name='mediaasset',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Ожидает обработки'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка')], default='pending', editable=False, max_length=20, verbose_name='Статус обработки'),
+        ),
+        migrations.AddField(
+            model_name='mediaasset',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты'),
+        ),
+        migrations.AlterField(
+            model_name='mediaasset',
+            name='file',
+            field=models.FileField(db_index=True, upload_to=adverts.models.advert_media_path, verbose_name='Файл'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaasset',
+            index=models.Index(fields=['processing_status', 'type'], name='adverts_med_process_9aee95_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0008_mediaasset_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaasset',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хэш содержимого'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaasset',
+            index=models.Index(fields=['content_hash'], name='adverts_med_content_01c4a8_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mediaasset',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('owner', 'content_hash'), name='media_asset_owner_content_unique'),
+        ),
+    ]
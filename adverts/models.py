@@ -50,15 +50,41 @@ class Advert(models.Model):
     title = models.CharField(max_length=120, verbose_name='Заголовок')
     body_md = models.TextField(verbose_name='Текст (Markdown)')
     body_html = models.TextField(verbose_name='Текст (HTML)', blank=True)
+    search_text = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Текст для поиска',
+        help_text='Текст объявления без разметки и медиа (заполняется автоматически)'
+    )
+    excerpt = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Анонс',
+        help_text='Начало текста без разметки для списка объявлений (заполняется автоматически)'
+    )
+    thumbnail = models.CharField(
+        max_length=500,
+        blank=True,
+        editable=False,
+        verbose_name='Превью',
+        help_text='URL первого изображения объявления (заполняется автоматически)'
+    )
     status = models.CharField(
         max_length=20,
         choices=Status.choices,
         default=Status.PUBLISHED,
         verbose_name='Статус'
     )
+    # Счётчики откликов (без удалённых); меняются только F()-обновлениями
+    # в replies.services, сверяются командой reconcile_reply_counters
+    replies_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов')
+    pending_replies_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов ожидает')
+    accepted_replies_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Откликов принято')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
     
+    REPLY_COUNTER_FIELDS = ('replies_count', 'pending_replies_count', 'accepted_replies_count')
+    
     class Meta:
         verbose_name = 'Объявление'
         verbose_name_plural = 'Объявления'
@@ -74,6 +100,16 @@ class Advert(models.Model):
     
     def get_absolute_url(self):
         return reverse('adverts:detail', kwargs={'pk': self.pk})
+    
+    def save(self, *args, **kwargs):
+        # Обычное сохранение (редактирование) не перезаписывает счётчики
+        # устаревшими значениями, загруженными вместе с объявлением
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.REPLY_COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
 
 class MediaAsset(models.Model):
@@ -85,13 +121,20 @@ class MediaAsset(models.Model):
         (VIDEO, 'Видео'),
     ]
     
+    class ProcessingStatus(models.TextChoices):
+        PENDING = 'pending', 'Ожидает обработки'
+        PROCESSING = 'processing', 'Обрабатывается'
+        READY = 'ready', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+    
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='media',
         verbose_name='Владелец'
     )
-    file = models.FileField(upload_to=advert_media_path, verbose_name='Файл')
+    # Индекс: страницы ищут варианты изображений по пути файла из URL
+    file = models.FileField(upload_to=advert_media_path, db_index=True, verbose_name='Файл')
     type = models.CharField(
         max_length=10,
         choices=TYPES,
@@ -104,30 +147,60 @@ class MediaAsset(models.Model):
     height = models.PositiveIntegerField(null=True, blank=True, verbose_name='Высота (для изображений)')
     poster = models.ImageField(upload_to=advert_media_path, null=True, blank=True, verbose_name='Постер (для видео)')
     duration = models.FloatField(null=True, blank=True, verbose_name='Длительность (секунды)')
+    # Уменьшенные копии изображения (adverts.media): {'width': ширина оригинала,
+    # '<формат>': {'<ширина>': путь в хранилище}}; создаются фоновым обработчиком
+    variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Варианты')
+    processing_status = models.CharField(
+        max_length=20,
+        choices=ProcessingStatus.choices,
+        default=ProcessingStatus.PENDING,
+        editable=False,
+        verbose_name='Статус обработки'
+    )
+    processed_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Обработано')
+    # SHA-256 содержимого: одинаковые загрузки используют один файл (adverts.media.store_media)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='Хэш содержимого')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
     
     class Meta:
         verbose_name = 'Медиафайл'
         verbose_name_plural = 'Медиафайлы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['processing_status', 'type']),
+            models.Index(fields=['content_hash']),
+        ]
+        constraints = [
+            # У пользователя одна запись на содержимое; старые записи без хэша не участвуют
+            models.UniqueConstraint(
+                fields=['owner', 'content_hash'],
+                condition=~models.Q(content_hash=''),
+                name='media_asset_owner_content_unique',
+            ),
+        ]
     
     def save(self, *args, **kwargs):
-        if self.file:
+        if self.file and (self._state.adding or not self.file._committed):
+            # Новый файл: размер и метаданные из заголовков (adverts.media.probe_media)
+            from .media import probe_media
+            
+            self.size = getattr(self.file, 'size', 0)
+            # MIME по содержимому надёжнее расширения; без него - по имени файла
+            self.apply_metadata(probe_media(self))
             if not self.mime:
                 self.mime = mimetypes.guess_type(self.file.name)[0] or ''
-            self.size = getattr(self.file, 'size', 0)
-            
-            # Для изображений получаем размеры
-            if self.type == self.IMAGE:
-                try:
-                    from PIL import Image
-                    img = Image.open(self.file)
-                    self.width, self.height = img.size
-                except Exception:
-                    pass
         
         super().save(*args, **kwargs)
     
+    def apply_metadata(self, metadata):
+        """Set probed metadata fields; returns the names of the changed fields."""
+        changed = []
+        for field, value in metadata.items():
+            if value and getattr(self, field) != value:
+                setattr(self, field, value)
+                changed.append(field)
+        return changed
+    
     def filename(self):
         """Возвращает имя файла без пути"""
         return os.path.basename(self.file.name)
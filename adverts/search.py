@@ -0,0 +1,142 @@
+"""
+Full-text search backends for adverts.
+
+Движок выбирается по СУБД (или настройкой ADVERT_SEARCH_BACKEND):
+- postgres: сгенерированный столбец tsvector с GIN-индексом, ранжирование ts_rank;
+- sqlite: виртуальная таблица FTS5, синхронизируется сигналами, ранжирование bm25;
+- basic: icontains по заголовку и извлечённому тексту (без Markdown и медиа).
+
+Индексируется Advert.search_text - plain-text извлечение из body_md.
+"""
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'adverts_advert_fts'
+SEARCH_VECTOR_COLUMN = 'search_vector'
+# Конфигурация text search PostgreSQL: зафиксирована в столбце search_vector
+# (миграция 0005), запросы обязаны использовать ту же; смена - новой миграцией
+SEARCH_CONFIG = 'russian'
+
+# Слова запроса для FTS5: только буквы/цифры, без операторов FTS-синтаксиса
+FTS_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BasicSearchBackend:
+    """Fallback search: substring match over title and plain-text body."""
+    name = 'basic'
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) | Q(search_text__icontains=query)
+        ).order_by('-created_at')
+
+    def index(self, advert):
+        pass
+
+    def remove(self, advert_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """
+    PostgreSQL full-text search.
+
+    search_vector - GENERATED ALWAYS ... STORED столбец (см. миграцию 0005),
+    PostgreSQL сам пересчитывает его при изменении title/search_text,
+    поэтому index/remove ничего не делают.
+    """
+    name = 'postgres'
+
+    def search(self, queryset, query):
+        table = queryset.model._meta.db_table
+        config = SEARCH_CONFIG
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        column = f'"{table}"."{SEARCH_VECTOR_COLUMN}"'
+        return queryset.alias(
+            search_match=RawSQL(f'{column} @@ {tsquery}', (config, query), output_field=BooleanField()),
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(f'ts_rank({column}, {tsquery})', (config, query), output_field=FloatField()),
+        ).order_by('-search_rank', '-created_at')
+
+
+class SqliteSearchBackend(BasicSearchBackend):
+    """SQLite FTS5 search over a virtual table keyed by advert id (rowid)."""
+    name = 'sqlite'
+
+    # Вес заголовка и текста в bm25 (меньше значение - выше релевантность)
+    TITLE_WEIGHT = 10.0
+    BODY_WEIGHT = 1.0
+
+    def _match_expression(self, query):
+        # Каждое слово - префиксный поиск, слова объединяются через AND
+        terms = FTS_TERM_RE.findall(query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        match = self._match_expression(query)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        matched = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        rank = (
+            f'SELECT bm25({FTS_TABLE}, {self.TITLE_WEIGHT}, {self.BODY_WEIGHT}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"'
+        )
+        return queryset.filter(
+            pk__in=RawSQL(matched, (match,)),
+        ).annotate(
+            search_rank=RawSQL(rank, (match,), output_field=FloatField()),
+        ).order_by('search_rank', '-created_at')
+
+    def index(self, advert):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [advert.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                [advert.pk, advert.title, advert.search_text],
+            )
+
+    def remove(self, advert_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [advert_id])
+
+    def rebuild(self):
+        from .models import Advert
+        table = Advert._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body) SELECT id, title, search_text FROM "{table}"'
+            )
+
+
+BACKENDS = {
+    BasicSearchBackend.name: BasicSearchBackend,
+    PostgresSearchBackend.name: PostgresSearchBackend,
+    SqliteSearchBackend.name: SqliteSearchBackend,
+}
+
+_backend = None
+
+
+def _detect_backend_name():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend.name
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return SqliteSearchBackend.name
+    return BasicSearchBackend.name
+
+
+def get_search_backend():
+    """Return the configured search backend (auto-detected from the database by default)."""
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'ADVERT_SEARCH_BACKEND', None) or _detect_backend_name()
+        _backend = BACKENDS[name]()
+    return _backend
@@ -1,154 +1,309 @@
 """
 Services for adverts app.
 """
+import hashlib
 from markdown_it import MarkdownIt
 import bleach
+from bleach.html5lib_shim import Filter
 from django.conf import settings
+from django.core.cache import cache, caches, InvalidCacheBackendError
+from django.core.cache.utils import make_template_fragment_key
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.text import Truncator
+
+
+DEFAULT_ALLOWED_TAGS = [
+    'p', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'a', 'img', 'video',
+    'blockquote', 'code', 'pre', 'strong', 'em', 'hr', 'br', 'source', 'figure', 'figcaption'
+]
+
+DEFAULT_ALLOWED_ATTRS = {
+    'a': ['href', 'title', 'rel', 'target'],
+    'img': ['src', 'alt', 'title', 'width', 'height', 'class', 'style'],
+    'video': ['controls', 'poster', 'preload', 'width', 'height', 'class', 'style'],
+    'source': ['src', 'type'],
+}
+
+DEFAULT_ALLOWED_PROTOCOLS = ['http', 'https', 'mailto', 'data']
+
+# Увеличить при изменении логики рендеринга (MarkdownMediaFilter и т.п.),
+# чтобы сбросить кэш отрендеренного HTML
+RENDER_PIPELINE_VERSION = 1
+
+
+def _normalize_media_src(src):
+    """Relative path without leading slash -> /media/<path>; data:, http and absolute paths are kept."""
+    if src.startswith('data:') or src.startswith('http') or src.startswith('/'):
+        return src
+    return f'/media/{src}'
+
+
+def _add_class(attrs, css_class):
+    classes = attrs.get((None, 'class'), '').split()
+    if css_class not in classes:
+        classes.append(css_class)
+    attrs[(None, 'class')] = ' '.join(classes)
+
+
+class MarkdownMediaFilter(Filter):
+    """
+    html5lib token filter applied by the bleach Cleaner after sanitization.
+    
+    Обрабатывает ссылки и медиа в том же проходе, что и санитизация:
+    внешние ссылки получают rel/target, пути изображений и видео нормализуются,
+    добавляются классы markdown-image / markdown-video.
+    """
+    def __iter__(self):
+        for token in super().__iter__():
+            if token['type'] not in ('StartTag', 'EmptyTag'):
+                yield token
+                continue
+            
+            name = token['name']
+            attrs = token['data']
+            
+            if name == 'a':
+                # Add rel="nofollow noopener" to external links
+                href = attrs.get((None, 'href'), '')
+                if href.startswith('http') and (None, 'rel') not in attrs:
+                    attrs[(None, 'rel')] = 'nofollow noopener'
+                    attrs.setdefault((None, 'target'), '_blank')
+            
+            elif name == 'img':
+                src = attrs.get((None, 'src'), '')
+                if not src:
+                    # Если src отсутствует, удаляем изображение
+                    continue
+                attrs[(None, 'src')] = _normalize_media_src(src)
+                _add_class(attrs, 'markdown-image')
+            
+            elif name in ('video', 'source'):
+                src = attrs.get((None, 'src'), '')
+                if src:
+                    attrs[(None, 'src')] = _normalize_media_src(src)
+                if name == 'video':
+                    # Добавляем controls если их нет
+                    attrs.setdefault((None, 'controls'), 'controls')
+                    _add_class(attrs, 'markdown-video')
+            
+            yield token
+
+
+class MarkdownPipeline:
+    """
+    Compiled Markdown -> safe HTML pipeline.
+    
+    Парсер и bleach Cleaner создаются один раз на процесс и переиспользуются
+    между вызовами markdown_to_html.
+    """
+    def __init__(self, tags, attributes, protocols):
+        # Версия конфигурации санитайзера - часть ключа кэша рендеринга
+        config = (
+            RENDER_PIPELINE_VERSION,
+            sorted(tags),
+            sorted((tag, sorted(attrs)) for tag, attrs in attributes.items()),
+            sorted(protocols),
+        )
+        self.version = hashlib.sha256(repr(config).encode('utf-8')).hexdigest()[:16]
+        self.md = MarkdownIt("commonmark")
+        self.cleaner = bleach.Cleaner(
+            tags=tags,
+            attributes=attributes,
+            protocols=protocols,
+            strip=True,
+            strip_comments=True,
+            filters=[MarkdownMediaFilter],
+        )
+    
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            tags=getattr(settings, 'BLEACH_ALLOWED_TAGS', DEFAULT_ALLOWED_TAGS),
+            attributes=getattr(settings, 'BLEACH_ALLOWED_ATTRS', DEFAULT_ALLOWED_ATTRS),
+            protocols=getattr(settings, 'BLEACH_ALLOWED_PROTOCOLS', DEFAULT_ALLOWED_PROTOCOLS),
+        )
+    
+    def render(self, md_text):
+        return self.cleaner.clean(self.md.render(md_text))
+
+
+_pipeline = None
+
+
+def get_markdown_pipeline():
+    """Return the process-wide MarkdownPipeline, building it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = MarkdownPipeline.from_settings()
+    return _pipeline
+
+
+@receiver(setting_changed)
+def _reset_markdown_pipeline(setting, **kwargs):
+    """Rebuild the pipeline when BLEACH_* settings are overridden (e.g. in tests)."""
+    global _pipeline
+    if setting.startswith('BLEACH_'):
+        _pipeline = None
+
+
+def _render_cache():
+    alias = getattr(settings, 'MARKDOWN_RENDER_CACHE', 'markdown')
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
 
 
 def markdown_to_html(md_text):
     """
     Convert Markdown to HTML with safe sanitization.
     Поддерживает изображения и видео.
+    
+    Результат кэшируется по хэшу текста и версии настроек санитайзера.
     """
     if not md_text:
         return ''
     
-    # Use markdown-it-py for conversion
-    md = MarkdownIt("commonmark")
-    
-    # Convert Markdown to HTML
-    html = md.render(md_text)
-    
-    # Sanitize HTML with bleach - используем настройки из settings
-    allowed_tags = getattr(settings, 'BLEACH_ALLOWED_TAGS', [
-        'p', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'a', 'img', 'video',
-        'blockquote', 'code', 'pre', 'strong', 'em', 'hr', 'br', 'source', 'figure', 'figcaption'
-    ])
-    
-    allowed_attrs = getattr(settings, 'BLEACH_ALLOWED_ATTRS', {
-        'a': ['href', 'title', 'rel', 'target'],
-        'img': ['src', 'alt', 'title', 'width', 'height', 'class', 'style'],
-        'video': ['controls', 'poster', 'preload', 'width', 'height', 'class', 'style'],
-        'source': ['src', 'type'],
-    })
-    
-    # Санитизация HTML через bleach с правильными настройками
-    allowed_protocols = getattr(settings, 'BLEACH_ALLOWED_PROTOCOLS', ['http', 'https', 'mailto', 'data'])
-    
-    # Clean HTML - используем настройки из settings
-    html = bleach.clean(
-        html,
-        tags=allowed_tags,
-        attributes=allowed_attrs,
-        protocols=allowed_protocols,
-        strip=True,
-        strip_comments=True
-    )
-    
-    # Обрабатываем медиа файлы после конвертации Markdown и санитизации
-    try:
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Add rel="nofollow noopener" to external links
-        for link in soup.find_all('a', href=True):
-            href = link.get('href', '')
-            if href.startswith('http') and 'rel' not in link.attrs:
-                link['rel'] = 'nofollow noopener'
-                if 'target' not in link.attrs:
-                    link['target'] = '_blank'
-        
-        # Обрабатываем изображения - нормализуем пути и добавляем классы
-        for img in soup.find_all('img'):
-            src = img.get('src', '')
-            if not src:
-                # Если src отсутствует, удаляем изображение
-                img.decompose()
-                continue
-            
-            # Проверяем, является ли это base64 data URI
-            if src.startswith('data:'):
-                # Base64 data URI - оставляем как есть, только добавляем класс
-                pass
-            elif src.startswith('/media/'):
-                # Правильный путь - оставляем как есть
-                pass
-            elif not src.startswith('http') and not src.startswith('/'):
-                # Относительный путь без слэша - добавляем /media/
-                img['src'] = f'/media/{src}'
-                src = img['src']
-            
-            # Добавляем класс для стилизации
-            if 'class' not in img.attrs:
-                img['class'] = []
-            if isinstance(img['class'], list):
-                if 'markdown-image' not in img['class']:
-                    img['class'].append('markdown-image')
-            elif isinstance(img['class'], str):
-                img['class'] = ['markdown-image']
-        
-        # Обрабатываем видео теги
-        for video in soup.find_all('video'):
-            # Проверяем source теги внутри video
-            sources = video.find_all('source')
-            if sources:
-                for source in sources:
-                    src = source.get('src', '')
-                    if src:
-                        # Проверяем, является ли это base64 data URI
-                        if src.startswith('data:'):
-                            # Base64 data URI - оставляем как есть
-                            pass
-                        elif not src.startswith('http') and not src.startswith('/'):
-                            # Относительный путь - добавляем /media/
-                            source['src'] = f'/media/{src}'
-            else:
-                # Если нет source тегов, проверяем атрибут src у video
-                src = video.get('src', '')
-                if src:
-                    # Проверяем, является ли это base64 data URI
-                    if src.startswith('data:'):
-                        # Base64 data URI - оставляем как есть
-                        pass
-                    elif not src.startswith('http') and not src.startswith('/'):
-                        video['src'] = f'/media/{src}'
-            
-            # Добавляем controls если их нет
-            if 'controls' not in video.attrs:
-                video['controls'] = True
-            
-            # Добавляем класс
-            if 'class' not in video.attrs:
-                video['class'] = []
-            if isinstance(video['class'], list):
-                if 'markdown-video' not in video['class']:
-                    video['class'].append('markdown-video')
-            elif isinstance(video['class'], str):
-                video['class'] = ['markdown-video']
-        
-        html = str(soup)
-    except ImportError:
-        # If BeautifulSoup is not available, skip processing
-        pass
+    pipeline = get_markdown_pipeline()
+    
+    # Слишком большие тексты (например, старые объявления с base64) не кэшируем
+    max_size = getattr(settings, 'MARKDOWN_RENDER_CACHE_MAX_BODY_SIZE', 512 * 1024)
+    if len(md_text) > max_size:
+        return pipeline.render(md_text)
+    
+    digest = hashlib.sha256(md_text.encode('utf-8')).hexdigest()
+    cache_key = f'md:{pipeline.version}:{digest}'
+    cache = _render_cache()
+    
+    html = cache.get(cache_key)
+    if html is None:
+        html = pipeline.render(md_text)
+        cache.set(cache_key, html)
     
     return html
 
 
+def extract_plain_text(md_text):
+    """
+    Extract plain text from Markdown for search indexing and excerpts.
+    
+    Берётся только текст: разметка, URL, встроенный HTML (видео)
+    и data: URI в индекс не попадают. Для изображений берётся alt.
+    """
+    if not md_text:
+        return ''
+    
+    parts = []
+    for token in get_markdown_pipeline().md.parse(md_text):
+        if token.type in ('fence', 'code_block'):
+            parts.append(token.content)
+        elif token.type == 'inline':
+            for child in token.children or []:
+                if child.type in ('text', 'code_inline', 'image'):
+                    parts.append(child.content)
+                elif child.type in ('softbreak', 'hardbreak'):
+                    parts.append(' ')
+            parts.append('\n')
+    
+    return ' '.join(''.join(parts).split())
+
+
+def extract_excerpt(plain_text, words=None):
+    """Truncate plain text to the first N words for list pages."""
+    if words is None:
+        words = getattr(settings, 'ADVERT_EXCERPT_WORDS', 50)
+    return Truncator(plain_text).words(words, truncate='…')
+
+
+def extract_first_image(md_text):
+    """
+    Return URL of the first Markdown image, or '' if there is none.
+    data: URI не возвращаются - превью должно быть лёгкой ссылкой.
+    """
+    if not md_text:
+        return ''
+    
+    for token in get_markdown_pipeline().md.parse(md_text):
+        if token.type != 'inline':
+            continue
+        for child in token.children or []:
+            if child.type == 'image':
+                src = child.attrGet('src') or ''
+                if src and not src.startswith('data:'):
+                    return _normalize_media_src(src)[:500]
+    return ''
+
+
+ADVERT_META_CACHE_KEY = 'advert:{pk}:meta'
+DETAIL_VERSION_CACHE_KEY = 'advert:detail_version'
+DETAIL_FRAGMENTS = ('advert_detail_title', 'advert_detail_header', 'advert_detail_body')
+
+
+def get_advert_meta(pk):
+    """
+    Return cached {'id', 'author_id', 'updated_at', reply counters} of a published advert, or None.
+    
+    Используется для conditional GET и проверки фрагментного кэша
+    без обращения к БД.
+    """
+    from .models import Advert
+    
+    key = ADVERT_META_CACHE_KEY.format(pk=pk)
+    meta = cache.get(key)
+    if meta is None:
+        meta = Advert.objects.filter(
+            pk=pk, status=Advert.Status.PUBLISHED
+        ).values('id', 'author_id', 'updated_at', *Advert.REPLY_COUNTER_FIELDS).first()
+        if meta is None:
+            return None
+        cache.set(key, meta, getattr(settings, 'ADVERT_DETAIL_CACHE_TIMEOUT', 60 * 60 * 24))
+    return meta
+
+
+def get_detail_cache_version():
+    """Global version of detail fragments, bumped when categories change."""
+    version = cache.get(DETAIL_VERSION_CACHE_KEY)
+    if version is None:
+        version = 1
+        cache.add(DETAIL_VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def bump_detail_cache_version():
+    try:
+        cache.incr(DETAIL_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(DETAIL_VERSION_CACHE_KEY, 2, None)
+
+
+def detail_fragment_keys(meta):
+    """Cache keys of detail.html fragments for the advert described by meta."""
+    vary_on = [meta['id'], meta['updated_at'].isoformat(), get_detail_cache_version()]
+    return [make_template_fragment_key(name, vary_on) for name in DETAIL_FRAGMENTS]
+
+
+def invalidate_advert_cache(*pks):
+    """
+    Drop cached detail metadata (also after reply counter changes);
+    fragments are keyed by updated_at and expire on their own.
+    """
+    cache.delete_many([ADVERT_META_CACHE_KEY.format(pk=pk) for pk in pks])
+
+
 def search_adverts(query, queryset=None):
     """
-    Search adverts by title and body.
+    Search adverts by title and body, ordered by relevance.
+    
+    Поиск выполняется настроенным движком (см. adverts.search).
     """
-    from django.db import models as db_models
     from .models import Advert
+    from .search import get_search_backend
     
     if queryset is None:
         queryset = Advert.objects.filter(status=Advert.Status.PUBLISHED)
     
     if query:
-        queryset = queryset.filter(
-            db_models.Q(title__icontains=query) | db_models.Q(body_md__icontains=query)
-        )
+        queryset = get_search_backend().search(queryset, query)
     
     return queryset
-
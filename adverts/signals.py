@@ -0,0 +1,57 @@
+"""
+Signals for adverts app.
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Advert, Category, MediaAsset
+from .search import get_search_backend
+from .services import (
+    extract_plain_text, extract_excerpt, extract_first_image,
+    invalidate_advert_cache, bump_detail_cache_version,
+)
+
+
+@receiver(pre_save, sender=Advert)
+def update_derived_text(sender, instance, update_fields=None, **kwargs):
+    """Keep plain-text extraction, excerpt and thumbnail of body_md in sync."""
+    if update_fields is None or 'body_md' in update_fields:
+        instance.search_text = extract_plain_text(instance.body_md)
+        instance.excerpt = extract_excerpt(instance.search_text)
+        instance.thumbnail = extract_first_image(instance.body_md)
+
+
+@receiver(post_save, sender=Advert)
+def index_advert(sender, instance, update_fields=None, **kwargs):
+    """Update full-text search index when Advert is saved."""
+    if update_fields is None or {'title', 'search_text'} & set(update_fields):
+        get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Advert)
+def unindex_advert(sender, instance, **kwargs):
+    """Remove Advert from full-text search index."""
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Advert)
+@receiver(post_delete, sender=Advert)
+def invalidate_advert_detail(sender, instance, **kwargs):
+    """Drop cached detail metadata so status/updated_at changes are seen immediately."""
+    invalidate_advert_cache(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_fragments(sender, instance, **kwargs):
+    """Category name is part of cached detail fragments."""
+    bump_detail_cache_version()
+
+
+@receiver(post_save, sender=MediaAsset)
+def queue_media_processing(sender, instance, created, **kwargs):
+    """Build image variants / video poster in the background once the upload is committed."""
+    # Запись на уже обработанный общий файл (adverts.media.store_media) не обрабатывается
+    if created and instance.processing_status == MediaAsset.ProcessingStatus.PENDING:
+        from .tasks import enqueue_media_processing
+        transaction.on_commit(lambda: enqueue_media_processing(instance.pk))
@@ -0,0 +1,32 @@
+"""
+Tasks for adverts app (for APScheduler).
+"""
+from .media import process_pending_media
+
+
+def process_media_assets(asset_ids):
+    """Build variants / posters of just uploaded assets (no-op if already claimed)."""
+    process_pending_media(asset_ids=asset_ids)
+
+
+def process_pending_media_assets():
+    """Periodic job: build variants / posters of pending and abandoned media assets."""
+    process_pending_media()
+
+
+def enqueue_media_processing(asset_id):
+    """
+    Schedule immediate processing of a new asset.
+    
+    Актив уже лежит в БД со статусом pending; если планировщик запущен в этом
+    процессе, обработка стартует сразу, иначе её подберёт process_pending_media_assets.
+    """
+    from config.apscheduler import add_task, scheduler
+    
+    if scheduler.running:
+        add_task(
+            'adverts.tasks:process_media_assets',
+            args=[[asset_id]],
+            id=f'adverts.process_media_assets.{asset_id}',
+            replace_existing=True,
+        )
@@ -0,0 +1,100 @@
+"""
+Template tags for advert media: srcset over MediaAsset image variants, video posters.
+"""
+import re
+from html import unescape
+
+from django import template
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+from adverts.media import get_image_variants, get_srcset, get_variant_presets, get_video_posters
+
+register = template.Library()
+
+IMG_TAG_RE = re.compile(r'<img\s[^>]*>', re.IGNORECASE)
+TAG_END_RE = re.compile(r'\s*/?>$')
+SRC_ATTR_RE = re.compile(r'\ssrc="([^"]*)"', re.IGNORECASE)
+PRELOAD_ATTR_RE = re.compile(r'\spreload(="[^"]*")?', re.IGNORECASE)
+VIDEO_RE = re.compile(r'(<video\b[^>]*?)(\s*/?>)(.*?</video>)', re.IGNORECASE | re.DOTALL)
+
+
+def _picture(img_tag, variants, preset):
+    """Wrap an <img> tag in <picture> with a WebP source; img gets the JPEG/PNG srcset."""
+    sizes = get_variant_presets()[preset]['sizes']
+    webp_srcset = get_srcset(variants, preset, 'webp')
+    fallback_srcset = get_srcset(variants, preset)
+    if not fallback_srcset:
+        return img_tag
+    end = TAG_END_RE.search(img_tag).start()
+    img_tag = img_tag[:end] + format_html(' srcset="{}" sizes="{}"', fallback_srcset, sizes) + img_tag[end:]
+    source = format_html('<source type="image/webp" srcset="{}" sizes="{}">', webp_srcset, sizes) if webp_srcset else ''
+    return f'<picture>{source}{img_tag}</picture>'
+
+
+@register.simple_tag(takes_context=True)
+def responsive_image(context, url, preset, **attrs):
+    """
+    Render <picture> for a /media/ image URL with srcset of the preset variants.
+
+    Использование: {% responsive_image advert.thumbnail 'thumb' alt='' class='rounded' %}.
+    Варианты берутся из context['image_variants'] (view загружает их одним
+    запросом на страницу), иначе ищутся по одному URL. Пока вариантов нет -
+    обычный <img> с оригиналом.
+    """
+    variants = (context.get('image_variants') or {}).get(url)
+    if variants is None:
+        variants = get_image_variants([url]).get(url, {})
+    attributes = ''.join(f' {name}="{escape(value)}"' for name, value in attrs.items())
+    img_tag = f'<img src="{escape(url)}"{attributes}>'
+    return mark_safe(_picture(img_tag, variants, preset))
+
+
+@register.filter
+def responsive_images(html, preset='detail'):
+    """Add srcset of the preset variants to /media/ images in sanitized advert HTML."""
+    if not html or '<img' not in html:
+        return mark_safe(html)
+
+    urls = {}
+    for tag in IMG_TAG_RE.findall(html):
+        src = SRC_ATTR_RE.search(tag)
+        if src:
+            urls[tag] = unescape(src.group(1))
+    variants = get_image_variants(urls.values())
+
+    def replace(match):
+        tag = match.group(0)
+        url = urls.get(tag)
+        return _picture(tag, variants.get(url), preset) if url in variants else tag
+
+    return mark_safe(IMG_TAG_RE.sub(replace, html))
+
+
+@register.filter
+def video_posters(html):
+    """
+    Add preload="none" and the extracted poster to videos in sanitized advert HTML.
+    
+    Браузер не скачивает начало ролика ради первого кадра: до нажатия
+    play показывается постер (adverts.media.extract_video_poster).
+    """
+    if not html or '<video' not in html:
+        return mark_safe(html)
+
+    sources = {}
+    for match in VIDEO_RE.finditer(html):
+        src = SRC_ATTR_RE.search(match.group(0))
+        if src:
+            sources[match.group(0)] = unescape(src.group(1))
+    posters = get_video_posters(sources.values())
+
+    def replace(match):
+        opening, end, rest = match.groups()
+        # Разметка автора не может включить предзагрузку ролика
+        opening = PRELOAD_ATTR_RE.sub('', opening) + ' preload="none"'
+        poster = posters.get(sources.get(match.group(0)))
+        if poster and ' poster=' not in opening:
+            opening += format_html(' poster="{}"', poster)
+        return opening + end + rest
+
+    return mark_safe(VIDEO_RE.sub(replace, html))
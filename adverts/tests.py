@@ -0,0 +1,168 @@
+"""
+Tests for adverts app.
+"""
+import base64
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from accounts.models import User
+from .media import collapse_duplicate_media, refresh_advert_fragments
+from .models import Advert, Category, MediaAsset
+from .services import detail_fragment_keys
+
+
+def png_bytes(color='red'):
+    """Small valid PNG image."""
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """Base test case with users, a category and an empty MEDIA_ROOT per test."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', username='author', password='pass', is_active=True)
+        self.other = User.objects.create_user(email='other@example.com', username='other', password='pass', is_active=True)
+        self.category = Category.objects.create(slug='tanks', name='Танки')
+
+    def create_asset(self, owner, name, content):
+        asset = MediaAsset(owner=owner, type=MediaAsset.IMAGE)
+        asset.file.save(name, ContentFile(content), save=False)
+        asset.save()
+        return asset
+
+    def create_advert(self, author, body_md):
+        return Advert.objects.create(author=author, category=self.category, title='Гильдия', body_md=body_md)
+
+    def storage(self):
+        return MediaAsset.file.field.storage
+
+
+class CollapseDuplicateMediaTests(MediaTestCase):
+    """collapse_duplicate_media with non-ASCII file names."""
+
+    def test_relinks_encoded_urls(self):
+        content = png_bytes()
+        kept = self.create_asset(self.author, 'гильдия.png', content)
+        duplicate = self.create_asset(self.author, 'гильдия.png', content)
+        self.assertNotEqual(kept.file.name, duplicate.file.name)
+        advert = self.create_advert(self.author, f'![Изображение]({duplicate.file.url})')
+        self.assertIn('%D0', advert.body_md)
+
+        stats = collapse_duplicate_media()
+
+        advert.refresh_from_db()
+        self.assertEqual(advert.body_md, f'![Изображение]({kept.file.url})')
+        self.assertEqual(stats['assets_removed'], 1)
+        self.assertEqual(stats['files_removed'], 1)
+        self.assertFalse(MediaAsset.objects.filter(pk=duplicate.pk).exists())
+        self.assertTrue(self.storage().exists(kept.file.name))
+        self.assertFalse(self.storage().exists(duplicate.file.name))
+
+    def test_keeps_file_referenced_by_other_adverts(self):
+        content = png_bytes('blue')
+        kept = self.create_asset(self.author, 'гильдия.png', content)
+        duplicate = self.create_asset(self.author, 'гильдия.png', content)
+        # Ссылка на чужой файл, вставленная другим пользователем, relink не переписывает
+        foreign = self.create_advert(self.other, f'![Изображение]({duplicate.file.url})')
+
+        stats = collapse_duplicate_media()
+
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.body_md, f'![Изображение]({duplicate.file.url})')
+        self.assertEqual(stats['files_removed'], 0)
+        self.assertTrue(self.storage().exists(duplicate.file.name))
+        self.assertTrue(self.storage().exists(kept.file.name))
+
+    def test_dry_run_changes_nothing(self):
+        content = png_bytes('green')
+        self.create_asset(self.author, 'гильдия.png', content)
+        duplicate = self.create_asset(self.author, 'гильдия.png', content)
+        advert = self.create_advert(self.author, f'![Изображение]({duplicate.file.url})')
+
+        stats = collapse_duplicate_media(dry_run=True)
+
+        advert.refresh_from_db()
+        self.assertEqual(stats['files_removed'], 1)
+        self.assertEqual(advert.body_md, f'![Изображение]({duplicate.file.url})')
+        self.assertTrue(MediaAsset.objects.filter(pk=duplicate.pk).exists())
+        self.assertTrue(self.storage().exists(duplicate.file.name))
+
+
+class RefreshAdvertFragmentsTests(MediaTestCase):
+    """refresh_advert_fragments finds adverts by the encoded file URL."""
+
+    def test_drops_fragments_of_adverts_with_encoded_url(self):
+        asset = self.create_asset(self.author, 'гильдия.png', png_bytes())
+        advert = self.create_advert(self.author, f'![Изображение]({asset.file.url})')
+        keys = detail_fragment_keys({'id': advert.pk, 'updated_at': advert.updated_at})
+        cache.set_many({key: 'fragment' for key in keys})
+
+        refresh_advert_fragments(asset)
+
+        self.assertEqual(cache.get_many(keys), {})
+
+
+class ExtractInlineMediaTests(MediaTestCase):
+    """extract_inline_media management command."""
+
+    def call_command(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('extract_inline_media', stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_extracts_png(self):
+        payload = base64.b64encode(png_bytes()).decode()
+        advert = self.create_advert(self.author, f'![Изображение](data:image/png;base64,{payload})')
+
+        self.call_command()
+
+        advert.refresh_from_db()
+        asset = MediaAsset.objects.get(owner=self.author)
+        self.assertEqual(advert.body_md, f'![Изображение]({asset.file.url})')
+        self.assertTrue(self.storage().exists(asset.file.name))
+
+    def test_leaves_svg_inline(self):
+        svg = base64.b64encode(b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>').decode()
+        body_md = f'![Схема](data:image/svg+xml;base64,{svg})'
+        advert = self.create_advert(self.author, body_md)
+
+        stdout, _ = self.call_command()
+
+        advert.refresh_from_db()
+        self.assertEqual(advert.body_md, body_md)
+        self.assertFalse(MediaAsset.objects.exists())
+        self.assertIn('image/svg+xml', stdout)
+
+    def test_skips_invalid_base64_and_continues(self):
+        payload = base64.b64encode(png_bytes()).decode()
+        # Первый кусок декодируется, второй - с битым выравниванием
+        broken_body = f'![Раз](data:image/png;base64,{payload}) ![Два](data:image/png;base64,iVBORw0KGgo)'
+        broken = self.create_advert(self.author, broken_body)
+        valid = self.create_advert(self.other, f'![Изображение](data:image/png;base64,{payload})')
+
+        _, stderr = self.call_command()
+
+        broken.refresh_from_db()
+        valid.refresh_from_db()
+        self.assertEqual(broken.body_md, broken_body)
+        self.assertIn(f'Advert {broken.pk}', stderr)
+        self.assertFalse(MediaAsset.objects.filter(owner=self.author).exists())
+        asset = MediaAsset.objects.get(owner=self.other)
+        self.assertEqual(valid.body_md, f'![Изображение]({asset.file.url})')
+        # Файл из отменённого объявления удалён вместе с записью
+        self.assertEqual(self.storage().listdir(f'adverts/{self.author.pk}')[1], [])
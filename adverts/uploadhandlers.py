@@ -0,0 +1,38 @@
+"""
+Upload handlers for adverts app: SHA-256 of the file is computed while it streams in.
+
+Хэш нужен для дедупликации MediaAsset (adverts.media.store_media); считая его
+по кускам при приёме, файл не приходится перечитывать или держать в памяти.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingUploadMixin:
+    """Set uploaded_file.content_hash to the hex SHA-256 of the received chunks."""
+    def new_file(self, *args, **kwargs):
+        # До super(): MemoryFileUploadHandler прерывает цепочку исключением StopFutureHandlers
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # Кусок принят этим обработчиком
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self.hasher.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
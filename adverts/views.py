@@ -4,18 +4,30 @@ Views for adverts app.
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.views.decorators.http import require_http_methods
+from django.core.cache import cache
+from django.http import Http404
+from django.utils.functional import cached_property
+from django.views.decorators.http import require_http_methods, condition
 from django.conf import settings
+from config.pagination import CursorPaginator
 from .models import Advert, Category
 from .forms import AdvertForm
-from .services import markdown_to_html
+from .media import get_image_variants
+from .services import (
+    markdown_to_html, search_adverts,
+    get_advert_meta, get_detail_cache_version, detail_fragment_keys, DETAIL_FRAGMENTS,
+)
 
 
 def advert_list(request):
     """List all published adverts with pagination and filters."""
-    queryset = Advert.objects.filter(status=Advert.Status.PUBLISHED).select_related('author', 'category')
+    # Only the columns list.html needs: full bodies are never loaded here
+    queryset = Advert.objects.filter(status=Advert.Status.PUBLISHED).select_related(
+        'author', 'category'
+    ).only(
+        'pk', 'title', 'excerpt', 'thumbnail', 'created_at', 'replies_count',
+        'author__email', 'category__name',
+    )
     
     # Filter by category
     category_slug = request.GET.get('category')
@@ -26,27 +38,26 @@ def advert_list(request):
         except Category.DoesNotExist:
             pass
     
-    # Search
+    # Search (ordered by relevance) or order by created_at desc
     search_query = request.GET.get('q', '').strip()
     if search_query:
-        queryset = queryset.filter(
-            Q(title__icontains=search_query) | Q(body_md__icontains=search_query)
-        )
-    
-    # Order by created_at desc
-    queryset = queryset.order_by('-created_at')
+        queryset = search_adverts(search_query, queryset)
     
-    # Pagination
+    # Cursor pagination over (status|category, -created_at) indexes;
+    # search results are ordered by relevance, so their cursor stores an offset
     paginate_by = getattr(settings, 'PAGINATE_BY', 15)
-    paginator = Paginator(queryset, paginate_by)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(queryset, paginate_by, keyset=not search_query)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     # Get all categories for filter
     categories = Category.objects.all()
     
+    # Варианты превью для srcset - один запрос (или обращение к кэшу) на страницу
+    image_variants = get_image_variants(advert.thumbnail for advert in page_obj.object_list)
+    
     context = {
         'page_obj': page_obj,
+        'image_variants': image_variants,
         'categories': categories,
         'current_category': category_slug,
         'search_query': search_query,
@@ -55,16 +66,75 @@ def advert_list(request):
     return render(request, 'adverts/list.html', context)
 
 
+class CachedAdvert:
+    """
+    Advert stand-in for a detail page whose fragments are cached.
+    
+    pk, автор и счётчики берутся из meta; если фрагмент успел истечь между
+    проверкой и рендерингом, обращение к любому другому полю загружает
+    объявление, и в кэш попадает настоящий фрагмент, а не пустой.
+    """
+    def __init__(self, meta):
+        self.pk = meta['id']
+        for field, value in meta.items():
+            setattr(self, field, value)
+    
+    @cached_property
+    def _advert(self):
+        advert = Advert.objects.select_related('author', 'category').filter(
+            pk=self.pk, status=Advert.Status.PUBLISHED
+        ).first()
+        if advert is None:
+            # DoesNotExist шаблон молча заменил бы пустой строкой
+            raise Http404('Объявление не найдено.')
+        return advert
+    
+    def __getattr__(self, name):
+        # Only called for attributes missing from meta
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._advert, name)
+
+
+def _detail_etag(request, pk):
+    """ETag from updated_at; varies by user because the page has per-user controls."""
+    meta = get_advert_meta(pk)
+    # Не отдаём 304, если есть сообщения для показа (после редиректа)
+    if meta is None or len(messages.get_messages(request)):
+        return None
+    counters = '.'.join(str(meta[field]) for field in Advert.REPLY_COUNTER_FIELDS)
+    return f'{pk}-{meta["updated_at"].timestamp()}-{counters}-{get_detail_cache_version()}-{request.user.pk or 0}'
+
+
+def _detail_last_modified(request, pk):
+    meta = get_advert_meta(pk)
+    if meta is None or len(messages.get_messages(request)):
+        return None
+    return meta['updated_at']
+
+
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
 def advert_detail(request, pk):
     """Detail view for an advert."""
-    advert = get_object_or_404(
-        Advert.objects.select_related('author', 'category'),
-        pk=pk,
-        status=Advert.Status.PUBLISHED
-    )
+    meta = get_advert_meta(pk)
+    if meta is None:
+        raise Http404('Объявление не найдено.')
+    
+    if len(cache.get_many(detail_fragment_keys(meta))) == len(DETAIL_FRAGMENTS):
+        # Header and body fragments are cached: the template only needs pk, author and counters
+        advert = CachedAdvert(meta)
+    else:
+        advert = get_object_or_404(
+            Advert.objects.select_related('author', 'category'),
+            pk=pk,
+            status=Advert.Status.PUBLISHED
+        )
     
     context = {
         'advert': advert,
+        'advert_updated_key': meta['updated_at'].isoformat(),
+        'detail_cache_version': get_detail_cache_version(),
+        'detail_cache_timeout': getattr(settings, 'ADVERT_DETAIL_CACHE_TIMEOUT', 60 * 60 * 24),
     }
     
     return render(request, 'adverts/detail.html', context)
@@ -74,31 +144,14 @@ def advert_detail(request, pk):
 def advert_create(request):
     """Create a new advert."""
     if request.method == 'POST':
-        form = AdvertForm(request.POST, request.FILES)
+        form = AdvertForm(request.POST, request.FILES, user=request.user)
         preview = request.POST.get('preview', False)
         
         if preview:
             # Preview mode - render Markdown without saving
             if form.is_valid():
-                body_md = form.cleaned_data.get('body_md', '')
-                
-                # Process uploaded media files for preview
-                image = form.cleaned_data.get('upload_image')
-                video = form.cleaned_data.get('upload_video')
-                
-                if image or video:
-                    # Convert files to base64 and insert into Markdown for preview
-                    image_data_uri = None
-                    video_data_uri = None
-                    
-                    if image:
-                        image_data_uri = form._file_to_base64(image, 'image')
-                    
-                    if video:
-                        video_data_uri = form._file_to_base64(video, 'video')
-                    
-                    # Insert media into body_md for preview
-                    body_md = form._insert_media_to_markdown(body_md, image_data_uri, video_data_uri)
+                # Store uploaded media files and reference them in Markdown for preview
+                body_md = form.attach_uploaded_media()
                 
                 body_html = markdown_to_html(body_md) if body_md else ''
                 context = {
@@ -117,7 +170,7 @@ def advert_create(request):
                 messages.success(request, 'Объявление успешно создано!')
                 return redirect('adverts:detail', pk=advert.pk)
     else:
-        form = AdvertForm()
+        form = AdvertForm(user=request.user)
     
     return render(request, 'adverts/create.html', {'form': form, 'show_preview': False})
 
@@ -133,31 +186,14 @@ def advert_edit(request, pk):
         return redirect('adverts:detail', pk=pk)
     
     if request.method == 'POST':
-        form = AdvertForm(request.POST, request.FILES, instance=advert)
+        form = AdvertForm(request.POST, request.FILES, instance=advert, user=request.user)
         preview = request.POST.get('preview', False)
         
         if preview:
             # Preview mode
             if form.is_valid():
-                body_md = form.cleaned_data.get('body_md', '')
-                
-                # Process uploaded media files for preview
-                image = form.cleaned_data.get('upload_image')
-                video = form.cleaned_data.get('upload_video')
-                
-                if image or video:
-                    # Convert files to base64 and insert into Markdown for preview
-                    image_data_uri = None
-                    video_data_uri = None
-                    
-                    if image:
-                        image_data_uri = form._file_to_base64(image, 'image')
-                    
-                    if video:
-                        video_data_uri = form._file_to_base64(video, 'video')
-                    
-                    # Insert media into body_md for preview
-                    body_md = form._insert_media_to_markdown(body_md, image_data_uri, video_data_uri)
+                # Store uploaded media files and reference them in Markdown for preview
+                body_md = form.attach_uploaded_media()
                 
                 body_html = markdown_to_html(body_md) if body_md else ''
                 context = {
@@ -175,7 +211,7 @@ def advert_edit(request, pk):
                 messages.success(request, 'Объявление успешно обновлено!')
                 return redirect('adverts:detail', pk=advert.pk)
     else:
-        form = AdvertForm(instance=advert)
+        form = AdvertForm(instance=advert, user=request.user)
     
     return render(request, 'adverts/edit.html', {'form': form, 'advert': advert, 'show_preview': False})
 
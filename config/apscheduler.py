@@ -1,17 +1,40 @@
 """
 APScheduler configuration for mmo_board project.
+
+Планировщик запускается только в отдельном процессе (manage.py run_worker),
+а не в каждом воркере gunicorn. Если запущено несколько run_worker, задачи
+выполняет один - лидер, удерживающий блокировку (WorkerLeaderLock),
+остальные ждут в резерве.
 """
+import hashlib
+import tempfile
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (разработка): блокировка файла через msvcrt
+    fcntl = None
+    import msvcrt
+
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.django import DjangoJobStore
-from apscheduler.executors.pool import ThreadPoolExecutor
-from django_apscheduler.jobstores import DjangoJobStore as DjangoApschedulerJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
+from apscheduler.util import ref_to_obj
 from django.conf import settings
+from django.db import close_old_connections, connections
+
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+}
 
 # Create scheduler
+# Периодические задачи регистрируются при каждом запуске (register_jobs),
+# поэтому хранить их в БД не нужно
 scheduler = BackgroundScheduler(
     jobstores={
-        'default': DjangoJobStore(),
-        'djangojobstore': DjangoApschedulerJobStore(),
+        'default': MemoryJobStore(),
     },
     executors={
         'default': ThreadPoolExecutor(20),
@@ -24,12 +47,162 @@ scheduler = BackgroundScheduler(
 )
 
 
+def configure_executor(kind=None, max_workers=None):
+    """Replace the default executor with a 'thread' or 'process' pool (SCHEDULER_EXECUTOR, SCHEDULER_MAX_WORKERS)."""
+    kind = kind or getattr(settings, 'SCHEDULER_EXECUTOR', 'thread')
+    max_workers = max_workers or getattr(settings, 'SCHEDULER_MAX_WORKERS', 10)
+    scheduler.configure(executors={'default': EXECUTORS[kind](max_workers)})
+
+
+def run_task(func_ref, *args):
+    """
+    Run a task given as a 'module:function' reference.
+
+    Потоки планировщика живут дольше запросов, поэтому соединения с БД
+    закрываются до и после задачи, как Django делает это между запросами.
+    """
+    close_old_connections()
+    try:
+        return ref_to_obj(func_ref)(*args)
+    finally:
+        close_old_connections()
+
+
+def add_task(func_ref, args=(), **kwargs):
+    """Add a job that runs func_ref through run_task."""
+    kwargs.setdefault('name', func_ref)
+    return scheduler.add_job('config.apscheduler:run_task', args=[func_ref, *args], **kwargs)
+
+
+def register_jobs():
+    """Register periodic jobs."""
+    add_task(
+        'replies.tasks:send_pending_notifications',
+        trigger='interval',
+        seconds=getattr(settings, 'NOTIFICATION_OUTBOX_INTERVAL', 10),
+        id='replies.send_pending_notifications',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    add_task(
+        'newsletters.tasks:process_queued_newsletter_jobs',
+        trigger='interval',
+        seconds=getattr(settings, 'NEWSLETTER_QUEUE_INTERVAL', 30),
+        id='newsletters.process_queued_newsletter_jobs',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    add_task(
+        'adverts.tasks:process_pending_media_assets',
+        trigger='interval',
+        seconds=getattr(settings, 'MEDIA_PROCESSING_INTERVAL', 15),
+        id='adverts.process_pending_media_assets',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    add_task(
+        'accounts.tasks:purge_expired_email_verifications',
+        trigger='interval',
+        seconds=getattr(settings, 'EMAIL_VERIFICATION_PURGE_INTERVAL', 60 * 60),
+        id='accounts.purge_expired_email_verifications',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    add_task(
+        'accounts.tasks:clear_expired_sessions',
+        trigger='cron',
+        hour=4,
+        minute=0,
+        id='accounts.clear_expired_sessions',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+
+
 def start_scheduler():
     """Start the scheduler."""
+    register_jobs()
     scheduler.start()
 
 
-def shutdown_scheduler():
-    """Shutdown the scheduler."""
-    scheduler.shutdown()
+def shutdown_scheduler(wait=True):
+    """Shutdown the scheduler; with wait=True running jobs are allowed to finish."""
+    if scheduler.running:
+        scheduler.shutdown(wait=wait)
+
+
+def _lock_file(lock_file):
+    """Take an exclusive non-blocking lock on an open file; raises OSError if it is held."""
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class WorkerLeaderLock:
+    """
+    Leader lock for run_worker processes.
+
+    PostgreSQL: сессионная advisory-блокировка на отдельном соединении,
+    сервер снимает её сам, если процесс умер. Прочие СУБД (SQLite всегда
+    на одном хосте): flock (msvcrt.locking на Windows) на файле SCHEDULER_LOCK_FILE.
+    """
+    def __init__(self, name='mmo_board.worker'):
+        self.name = name
+        self.key = int.from_bytes(hashlib.sha256(name.encode('utf-8')).digest()[:8], 'big', signed=True)
+        self._connection = None
+        self._file = None
+
+    def acquire(self):
+        """Try to take the lock without blocking; returns True on success."""
+        if connections['default'].vendor == 'postgresql':
+            return self._acquire_advisory()
+        return self._acquire_file()
+
+    def release(self):
+        if self._connection is not None:
+            with self._connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [self.key])
+            self._connection.close()
+            self._connection = None
+        if self._file is not None:
+            _unlock_file(self._file)
+            self._file.close()
+            self._file = None
+
+    def _acquire_advisory(self):
+        # Своё соединение: close_old_connections() в задачах не должен снять блокировку
+        connection = connections.create_connection('default')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.key])
+            locked = cursor.fetchone()[0]
+        if locked:
+            self._connection = connection
+        else:
+            connection.close()
+        return locked
 
+    def _acquire_file(self):
+        path = getattr(settings, 'SCHEDULER_LOCK_FILE', None) or Path(tempfile.gettempdir()) / f'{self.name}.lock'
+        lock_file = open(path, 'a')
+        try:
+            _lock_file(lock_file)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
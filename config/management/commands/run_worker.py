@@ -0,0 +1,79 @@
+"""
+Management command to run the background task worker (APScheduler).
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from config.apscheduler import (
+    EXECUTORS, WorkerLeaderLock, configure_executor, scheduler, shutdown_scheduler, start_scheduler,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run periodic and queued background jobs in a dedicated process (one leader at a time)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--executor',
+            choices=sorted(EXECUTORS),
+            default=getattr(settings, 'SCHEDULER_EXECUTOR', 'thread'),
+            help='Job executor: thread or process pool (default: SCHEDULER_EXECUTOR)',
+        )
+        parser.add_argument(
+            '--max-workers',
+            type=int,
+            default=getattr(settings, 'SCHEDULER_MAX_WORKERS', 10),
+            help='Executor pool size (default: SCHEDULER_MAX_WORKERS)',
+        )
+        parser.add_argument(
+            '--standby-interval',
+            type=int,
+            default=15,
+            help='Seconds between attempts to become leader while another worker runs (default: 15)',
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write(f'Received signal {signum}, shutting down...')
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        # Только один процесс выполняет задачи; остальные ждут в резерве
+        lock = WorkerLeaderLock()
+        announced = False
+        while not lock.acquire():
+            if not announced:
+                self.stdout.write(self.style.WARNING('Another worker is the leader, waiting in standby...'))
+                announced = True
+            if stop.wait(options['standby_interval']):
+                return
+
+        try:
+            if options['executor'] == 'process':
+                # Дочерние процессы не должны унаследовать открытые соединения с БД
+                connections.close_all()
+            configure_executor(options['executor'], options['max_workers'])
+            start_scheduler()
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Worker started as leader ({options["executor"]} executor, {options["max_workers"]} workers)'
+            ))
+            for job in scheduler.get_jobs():
+                self.stdout.write(f'  {job.id}: {job.trigger}')
+
+            # Периодическое ожидание, чтобы обработчик сигнала гарантированно сработал
+            while not stop.wait(1):
+                pass
+        finally:
+            # Дожидаемся выполняющихся задач: рассылки и очередь уведомлений
+            # продолжатся с контрольной точки, но незачем обрывать пачку
+            shutdown_scheduler(wait=True)
+            lock.release()
+            self.stdout.write(self.style.SUCCESS('Worker stopped.'))
@@ -0,0 +1,159 @@
+"""
+Media file serving for mmo_board project.
+
+Вместо django.views.static.serve (читает файл целиком, не знает Range):
+- Range/If-Range - перемотка видео запрашивает только нужный диапазон байт;
+- ETag/Last-Modified - повторные запросы получают 304;
+- полный файл отдаётся FileResponse (wsgi.file_wrapper/sendfile сервера);
+- при MEDIA_SENDFILE передача отдаётся фронт-прокси (X-Accel-Redirect
+  для nginx, X-Sendfile для Apache/lighttpd), и воркер Python сразу свободен.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into (start, end) inclusive.
+
+    Returns None when the header is absent, malformed or has several ranges
+    (ответ - весь файл, RFC 9110 это допускает), and False when the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N: последние N байт
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    """If-Range holds an ETag or an HTTP date; a mismatch means the whole file must be sent."""
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        # Слабые ETag для If-Range не подходят
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and int(mtime) <= date
+
+
+def read_range(path, start, length):
+    """Yield length bytes of path starting at start, in bounded blocks."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_BLOCK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(path, name):
+    """Empty response telling the front proxy to send the file itself, or None if not configured."""
+    backend = getattr(settings, 'MEDIA_SENDFILE', '')
+    if backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix + quote(name)
+        return response
+    if backend == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT with Range, conditional GET and optional proxy handoff."""
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден.')
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404('Файл не найден.')
+    if not os.path.isfile(fullpath):
+        raise Http404('Файл не найден.')
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        response['Accept-Ranges'] = 'bytes'
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60))
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if conditional is not None:
+        return finish(conditional)
+
+    sendfile = _sendfile_response(fullpath, path)
+    if sendfile is not None:
+        # Range и отдачу байт выполняет прокси
+        sendfile['Content-Type'] = content_type
+        return finish(sendfile)
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is not None and not if_range_matches(request, etag, stat.st_mtime):
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    if byte_range is None:
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        else:
+            # FileResponse отдаёт файл через wsgi.file_wrapper (sendfile), если сервер его даёт
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        if request.method == 'HEAD':
+            response = HttpResponse(status=206, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(read_range(fullpath, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return finish(response)
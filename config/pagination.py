@@ -0,0 +1,200 @@
+"""
+Cursor (keyset) pagination for mmo_board project.
+
+Вместо ?page=N с COUNT(*) и OFFSET страница определяется непрозрачным
+токеном с ключом последней/первой записи: WHERE (created_at, id) < (...)
+ORDER BY -created_at, -id LIMIT N+1 - это диапазонное сканирование индекса
+при любой глубине.
+"""
+import base64
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# Предел для приблизительного подсчёта на СУБД без оценок планировщика
+APPROXIMATE_COUNT_LIMIT = 1000
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder truncates datetimes to milliseconds; keys need full precision."""
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, cls=CursorEncoder, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode cursor token; returns None for missing or malformed tokens."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class CursorPage:
+    """One page of results with opaque next/previous cursors."""
+    def __init__(self, paginator, object_list, next_cursor=None, previous_cursor=None):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def approximate_total(self):
+        return self.paginator.approximate_total
+
+    @property
+    def total_is_exact(self):
+        return self.paginator.total_is_exact
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over an ordered queryset.
+
+    ordering - поля сортировки (последнее должно быть уникальным, обычно pk),
+    под них должен существовать индекс. keyset=False - для выборок с порядком,
+    который нельзя выразить ключом (релевантность поиска): токен хранит смещение.
+    """
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-pk'), keyset=True):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.keyset = keyset
+
+    def get_page(self, cursor=None):
+        data = decode_cursor(cursor)
+        if not self.keyset:
+            return self._offset_page(data)
+        if data and data.get('d') in (NEXT, PREVIOUS) and len(data.get('k', [])) == len(self.ordering):
+            return self._keyset_page(data['d'], data['k'])
+        return self._keyset_page(None, None)
+
+    # Keyset mode
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name, _ in self._fields()]
+
+    def _to_python(self, name, value):
+        field = self.queryset.model._meta.pk if name == 'pk' else self.queryset.model._meta.get_field(name)
+        return field.to_python(value)
+
+    def _after(self, key, forward):
+        """Q for rows strictly after key (forward) or strictly before it (backward) in ordering."""
+        fields = self._fields()
+        values = [self._to_python(name, value) for (name, _), value in zip(fields, key)]
+        condition = Q()
+        for i, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[i]})
+            for j in range(i):
+                branch &= Q(**{fields[j][0]: values[j]})
+            condition |= branch
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def _keyset_page(self, direction, key):
+        size = self.per_page
+        if direction == PREVIOUS:
+            queryset = self.queryset.filter(self._after(key, forward=False)).order_by(*self._reversed_ordering())
+            rows = list(queryset[:size + 1])
+            has_more = len(rows) > size
+            rows = rows[:size][::-1]
+            has_previous, has_next = has_more, True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if direction == NEXT:
+                queryset = queryset.filter(self._after(key, forward=True))
+            rows = list(queryset[:size + 1])
+            has_next = len(rows) > size
+            rows = rows[:size]
+            has_previous = direction == NEXT
+
+        if not rows:
+            return CursorPage(self, rows)
+
+        next_cursor = encode_cursor({'d': NEXT, 'k': self._key(rows[-1])}) if has_next else None
+        previous_cursor = encode_cursor({'d': PREVIOUS, 'k': self._key(rows[0])}) if has_previous else None
+        return CursorPage(self, rows, next_cursor, previous_cursor)
+
+    # Offset mode (keyset=False)
+
+    def _offset_page(self, data):
+        offset = data.get('o', 0) if data else 0
+        if not isinstance(offset, int) or offset < 0:
+            offset = 0
+        size = self.per_page
+        rows = list(self.queryset[offset:offset + size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        next_cursor = encode_cursor({'o': offset + size}) if has_next else None
+        previous_cursor = encode_cursor({'o': max(offset - size, 0)}) if offset > 0 else None
+        return CursorPage(self, rows, next_cursor, previous_cursor)
+
+    @cached_property
+    def _approximate_count(self):
+        if connection.vendor == 'postgresql':
+            sql, params = self.queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows']), False
+        count = self.queryset.order_by()[:APPROXIMATE_COUNT_LIMIT + 1].count()
+        if count > APPROXIMATE_COUNT_LIMIT:
+            return APPROXIMATE_COUNT_LIMIT, False
+        return count, True
+
+    @property
+    def approximate_total(self):
+        """
+        Approximate number of rows without a full COUNT(*): planner estimate
+        on PostgreSQL, otherwise a count capped at APPROXIMATE_COUNT_LIMIT.
+        """
+        return self._approximate_count[0]
+
+    @property
+    def total_is_exact(self):
+        return self._approximate_count[1]
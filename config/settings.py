@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'allauth.socialaccount.providers.google',
     
     # Local apps
+    'config',  # Общие для проекта команды (run_worker рядом с config/apscheduler.py)
     'accounts',
     'adverts',
     'replies',
@@ -147,13 +148,41 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'  # обязательно со слэшем!
 MEDIA_ROOT = BASE_DIR / 'media'  # папка должна существовать и быть доступной на запись
 
-# Ограничения для медиа файлов (base64)
+# Отдача медиа (config.media): Range, ETag, Cache-Control
+MEDIA_CACHE_MAX_AGE = 60 * 60  # Сколько секунд браузер может не перепроверять файл
+# Передать отправку файла фронт-прокси: 'x-accel-redirect' (nginx), 'x-sendfile' (Apache/lighttpd) или пусто.
+# Для nginx нужен internal location, например:
+#   location /protected-media/ { internal; alias /path/to/media/; }
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Ограничения для медиа файлов (сохраняются как MediaAsset в MEDIA_ROOT)
 MAX_IMAGE_SIZE_MB = 10  # МБ для изображений
 MAX_VIDEO_SIZE_MB = 100  # МБ для видео
-MAX_VIDEO_DURATION = 10  # Максимальная длительность видео в секундах (не используется для base64)
+MAX_VIDEO_DURATION = 10  # Максимальная длительность видео в секундах
 
-# Настройки загрузки файлов для base64
-FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_VIDEO_SIZE_MB * 1024 * 1024  # Размер в байтах для видео (100 МБ)
+# Уменьшенные копии изображений MediaAsset (adverts.media): ширины 1x/2x и sizes для srcset
+MEDIA_IMAGE_VARIANTS = {
+    'thumb': {'widths': [120, 240], 'sizes': '120px'},  # Превью в списке объявлений
+    'detail': {'widths': [800, 1600], 'sizes': '(max-width: 840px) 100vw, 800px'},  # Текст объявления
+}
+MEDIA_IMAGE_VARIANT_QUALITY = 80  # Качество WebP/JPEG
+MEDIA_PROCESSING_INTERVAL = 15  # Как часто фоновый обработчик подбирает новые файлы (секунды)
+MEDIA_PROCESSING_BATCH_SIZE = 20  # Файлов за один проход
+MEDIA_PROCESSING_WORKERS = int(os.getenv('MEDIA_PROCESSING_WORKERS', '2'))  # Потоков перекодирования
+MEDIA_PROCESSING_LEASE = 10 * 60  # Файл в обработке дольше этого (секунды) считается брошенным
+MEDIA_PROBE_READ_BUDGET = 512 * 1024  # Сколько байт с начала файла читать для метаданных изображения
+MEDIA_VIDEO_POSTER_WIDTH = 1280  # Максимальная ширина постера видео
+MEDIA_VIDEO_POSTER_MIN_BRIGHTNESS = 40  # Кадр темнее (0-255) считается заставкой, берётся следующий
+
+# Настройки загрузки файлов
+# Файлы больше этого порога пишутся во временный файл на диске, а не держатся в памяти
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 МБ (значение Django по умолчанию)
+# Стандартные обработчики Django, дополнительно считающие SHA-256 файла при приёме (дедупликация медиа)
+FILE_UPLOAD_HANDLERS = [
+    'adverts.uploadhandlers.HashingMemoryFileUploadHandler',
+    'adverts.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_VIDEO_SIZE_MB * 1024 * 1024  # Размер в байтах для данных формы
 
 # Default primary key field type
@@ -273,19 +302,40 @@ SOCIALACCOUNT_STORE_TOKENS = False
 # Cache configuration
 CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
 
+# Кэш отрендеренного Markdown: ограничен по числу записей, старые вытесняются
+MARKDOWN_RENDER_CACHE = 'markdown'
+MARKDOWN_RENDER_CACHE_OPTIONS = {
+    'MAX_ENTRIES': int(os.getenv('MARKDOWN_CACHE_MAX_ENTRIES', '2000')),
+    'CULL_FREQUENCY': 3,
+}
+MARKDOWN_RENDER_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 7 дней
+MARKDOWN_RENDER_CACHE_MAX_BODY_SIZE = 512 * 1024  # Тексты больше 512 КБ не кэшируются
+
 if 'DatabaseCache' in CACHE_BACKEND:
     CACHES = {
         'default': {
             'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
             'LOCATION': 'cache_table',
-        }
+        },
+        MARKDOWN_RENDER_CACHE: {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'markdown_cache_table',
+            'TIMEOUT': MARKDOWN_RENDER_CACHE_TIMEOUT,
+            'OPTIONS': MARKDOWN_RENDER_CACHE_OPTIONS,
+        },
     }
 else:
     CACHES = {
         'default': {
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
             'LOCATION': 'unique-snowflake',
-        }
+        },
+        MARKDOWN_RENDER_CACHE: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'markdown-render',
+            'TIMEOUT': MARKDOWN_RENDER_CACHE_TIMEOUT,
+            'OPTIONS': MARKDOWN_RENDER_CACHE_OPTIONS,
+        },
     }
 
 # Logging
@@ -363,6 +413,10 @@ LOGGING = {
             'handlers': ['console', 'file_general'],
             'level': os.getenv('LOG_LEVEL', 'INFO'),
         },
+        'apscheduler': {
+            'handlers': ['console', 'file_general'],
+            'level': os.getenv('LOG_LEVEL', 'INFO'),
+        },
     },
 }
 
@@ -379,6 +433,33 @@ if not DEBUG:
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
 
+# Фоновый обработчик задач (manage.py run_worker)
+SCHEDULER_EXECUTOR = os.getenv('SCHEDULER_EXECUTOR', 'thread')  # 'thread' или 'process'
+SCHEDULER_MAX_WORKERS = int(os.getenv('SCHEDULER_MAX_WORKERS', '10'))
+# Файл блокировки лидера для СУБД без advisory-блокировок (SQLite); пусто - во временном каталоге
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', '')
+
+# Очередь email-уведомлений об откликах (replies.NotificationOutbox)
+NOTIFICATION_OUTBOX_INTERVAL = 10  # Как часто обработчик проверяет очередь (секунды)
+NOTIFICATION_OUTBOX_BATCH_SIZE = 50  # Писем за одно SMTP-соединение
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 5  # После стольких ошибок уведомление помечается как failed
+NOTIFICATION_OUTBOX_RETRY_BASE = 60  # Первая задержка повтора (секунды), далее удваивается
+NOTIFICATION_OUTBOX_RETRY_MAX = 60 * 60  # Максимальная задержка повтора (секунды)
+NOTIFICATION_OUTBOX_LEASE = 5 * 60  # Сколько уведомление считается занятым отправкой (секунды)
+
+# Очистка кодов подтверждения email (истёкших и использованных)
+EMAIL_VERIFICATION_PURGE_INTERVAL = 60 * 60  # Секунды
+EMAIL_VERIFICATION_PURGE_CHUNK_SIZE = 1000  # Строк в одном DELETE
+
+# Рассылки (newsletters.delivery): потоки-отправители и ограничения скорости
+NEWSLETTER_WORKERS = int(os.getenv('NEWSLETTER_WORKERS', '4'))  # Потоков, у каждого своё SMTP-соединение
+NEWSLETTER_RATE_LIMIT = float(os.getenv('NEWSLETTER_RATE_LIMIT', '10'))  # Писем в секунду на все потоки (0 - без ограничения)
+NEWSLETTER_CONNECTION_RATE_LIMIT = float(os.getenv('NEWSLETTER_CONNECTION_RATE_LIMIT', '1'))  # Новых соединений в секунду
+NEWSLETTER_QUEUE_INTERVAL = 30  # Как часто планировщик подбирает задачи рассылок из очереди (секунды)
+NEWSLETTER_JOB_LEASE = 5 * 60  # Задача без прогресса дольше этого (секунды) считается брошенной
+# Базовый адрес сайта для ссылок в письмах; пусто - домен текущего Site
+SITE_URL = os.getenv('SITE_URL', '')
+
 # File upload limits
 MAX_IMAGE_UPLOAD_SIZE = 15 * 1024 * 1024  # 15 MB
 MAX_VIDEO_UPLOAD_SIZE = 50 * 1024 * 1024  # 50 MB для видео
@@ -410,3 +491,13 @@ ALLOWED_PROTOCOLS = BLEACH_ALLOWED_PROTOCOLS
 # Pagination
 PAGINATE_BY = 15
 
+# Длина анонса объявления в списке (слов)
+ADVERT_EXCERPT_WORDS = 50
+
+# Время жизни кэша фрагментов страницы объявления (секунды)
+ADVERT_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Полнотекстовый поиск объявлений (adverts.search)
+# Движок: 'postgres', 'sqlite', 'basic' или пусто - автоопределение по СУБД
+ADVERT_SEARCH_BACKEND = os.getenv('ADVERT_SEARCH_BACKEND', '')
+
@@ -2,10 +2,12 @@
 URL configuration for mmo_board project.
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView
+from config.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -17,8 +19,11 @@ urlpatterns = [
     path('', RedirectView.as_view(url='/adverts/', permanent=False), name='index'),
 ]
 
-# В локальном окружении всегда отдаём медиа самим Django (без Nginx)
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Медиа отдаются с поддержкой Range и conditional GET; в production
+# при MEDIA_SENDFILE сами байты отправляет nginx/Apache (см. config.media)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+]
 
 # Serve static files from STATICFILES_DIRS
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
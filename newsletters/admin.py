@@ -2,7 +2,8 @@
 Admin configuration for newsletters app.
 """
 from django.contrib import admin
-from .models import Subscription, NewsletterTemplate, NewsletterSendJob
+from .models import Subscription, NewsletterTemplate, NewsletterSendJob, NewsletterDelivery
+from .services import summarize_deliveries
 
 
 @admin.register(Subscription)
@@ -27,10 +28,30 @@ class NewsletterTemplateAdmin(admin.ModelAdmin):
 @admin.register(NewsletterSendJob)
 class NewsletterSendJobAdmin(admin.ModelAdmin):
     """NewsletterSendJob admin."""
-    list_display = ['template', 'status', 'total', 'sent', 'errors', 'started_at', 'finished_at']
+    list_display = ['template', 'status', 'total', 'sent', 'errors', 'throughput', 'started_at', 'finished_at']
     list_filter = ['status', 'started_at']
     search_fields = ['template__title']
-    readonly_fields = ['started_at', 'finished_at']
+    readonly_fields = ['started_at', 'finished_at', 'last_error', 'delivery_summary']
     raw_id_fields = ['template']
     date_hierarchy = 'started_at'
+    
+    @admin.display(description='Доставки')
+    def delivery_summary(self, obj):
+        if not obj.pk:
+            return '-'
+        summary = summarize_deliveries(obj)
+        return ', '.join(
+            f'{label}: {summary[status]}' for status, label in NewsletterDelivery.Status.choices
+        )
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    """NewsletterDelivery admin."""
+    list_display = ['job', 'subscription', 'status', 'attempts', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['updated_at']
+    raw_id_fields = ['job', 'subscription']
+    # Журнал большой - без полного COUNT(*) по таблице
+    show_full_result_count = False
 
@@ -0,0 +1,266 @@
+"""
+Parallel newsletter delivery.
+
+Пачки адресов раздаются нескольким потокам-отправителям, у каждого своё
+SMTP-соединение. Вместо фиксированных пауз между пачками скорость задаётся
+общими для всех потоков token bucket-ограничителями: писем в секунду и
+новых соединений в секунду.
+"""
+import logging
+import queue
+from collections import deque
+import smtplib
+import threading
+import time
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+logger = logging.getLogger('newsletters')
+
+# Ошибки конкретного письма (адрес отклонён и т.п.) - соединение в порядке
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# Ошибки соединения, после которых имеет смысл переподключиться и повторить письмо
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    rate - токенов в секунду (0 или None - без ограничения),
+    capacity - допустимый всплеск (по умолчанию секундный запас).
+    """
+    def __init__(self, rate=None, capacity=None):
+        self.rate = float(rate or 0)
+        self.capacity = float(capacity or max(self.rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def build_newsletter_message(newsletter, recipient, connection=None):
+    """
+    Build newsletter email (text body + HTML alternative) for one
+    (subscription_id, email) recipient of a CompiledNewsletter.
+    """
+    subscription_id, email = recipient
+    html_body, text_body, unsubscribe_url = newsletter.render(subscription_id, email)
+    message = EmailMultiAlternatives(
+        subject=newsletter.subject,
+        body=text_body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+        connection=connection,
+        headers={'List-Unsubscribe': f'<{unsubscribe_url}>'},
+    )
+    message.attach_alternative(html_body, 'text/html')
+    return message
+
+
+def send_messages_over_connection(connection, messages, rate_limiter=None, connection_limiter=None):
+    """
+    Send messages one by one over an open connection, reconnecting once
+    if the connection drops. Returns a list of (message, error) for failures.
+    """
+    failures = []
+    for message in messages:
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            connection.send_messages([message])
+        except MESSAGE_ERRORS as e:
+            failures.append((message, e))
+        except CONNECTION_ERRORS as e:
+            # Соединение оборвалось - переподключаемся и повторяем письмо один раз
+            logger.warning(f'SMTP connection lost ({e}), reconnecting')
+            try:
+                connection.close()
+                if connection_limiter:
+                    connection_limiter.acquire()
+                connection.open()
+                connection.send_messages([message])
+            except Exception as retry_error:
+                failures.append((message, retry_error))
+        except Exception as e:
+            failures.append((message, e))
+    return failures
+
+
+class BatchResult:
+    """
+    Outcome of one batch of (subscription_id, email) recipients:
+    number of sent messages and (recipient, error) failures.
+    """
+    def __init__(self, batch, sent, failures):
+        self.batch = batch
+        self.sent = sent
+        self.failures = failures
+
+
+class BatchCheckpoint:
+    """
+    Tracks the highest subscription id below which every batch is finished.
+
+    Потоки завершают пачки не по порядку, поэтому контрольная точка
+    сдвигается только по непрерывному префиксу завершённых пачек.
+    """
+    def __init__(self, position=0):
+        self.position = position
+        self._in_flight = deque()
+        self._done = set()
+
+    def dispatched(self, batch):
+        self._in_flight.append(batch[-1][0])
+
+    def finished(self, batch):
+        """Mark batch finished; returns True if the checkpoint moved."""
+        self._done.add(batch[-1][0])
+        moved = False
+        while self._in_flight and self._in_flight[0] in self._done:
+            self.position = self._in_flight.popleft()
+            self._done.discard(self.position)
+            moved = True
+        return moved
+
+
+class DeliveryWorker(threading.Thread):
+    """Sender thread with its own SMTP connection; takes email batches from a queue."""
+    def __init__(self, newsletter, tasks, results, rate_limiter, connection_limiter):
+        super().__init__(daemon=True)
+        self.newsletter = newsletter
+        self.tasks = tasks
+        self.results = results
+        self.rate_limiter = rate_limiter
+        self.connection_limiter = connection_limiter
+
+    def run(self):
+        connection = None
+        try:
+            connection = get_connection(fail_silently=False)
+            self.connection_limiter.acquire()
+            try:
+                connection.open()
+            except CONNECTION_ERRORS as e:
+                # Письма будут пытаться переподключиться по одному
+                logger.error(f'Cannot open SMTP connection for newsletter: {e}')
+            while True:
+                batch = self.tasks.get()
+                if batch is None:
+                    return
+                self.results.put(self.send_batch(connection, batch))
+        except Exception as e:
+            logger.exception('Newsletter worker stopped')
+            # Поток продолжает разбирать очередь, иначе deliver() навсегда
+            # заблокируется на tasks.put; оставшиеся пачки - ошибки доставки
+            self.drain(e)
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+    def send_batch(self, connection, batch):
+        """Send one batch; returns its BatchResult."""
+        try:
+            messages = [
+                build_newsletter_message(self.newsletter, recipient, connection)
+                for recipient in batch
+            ]
+            recipients = {id(message): recipient for message, recipient in zip(messages, batch)}
+            failures = send_messages_over_connection(
+                connection,
+                messages,
+                rate_limiter=self.rate_limiter,
+                connection_limiter=self.connection_limiter,
+            )
+            failures = [(recipients[id(message)], error) for message, error in failures]
+        except Exception as e:
+            logger.exception('Newsletter worker failed on a batch')
+            failures = [(recipient, e) for recipient in batch]
+        return BatchResult(batch, len(batch) - len(failures), failures)
+
+    def drain(self, error):
+        """Report every remaining batch as failed with error until the stop marker."""
+        while True:
+            batch = self.tasks.get()
+            if batch is None:
+                return
+            self.results.put(BatchResult(batch, 0, [(recipient, error) for recipient in batch]))
+
+
+def get_delivery_options(workers=None, rate=None, connection_rate=None):
+    """Fill missing delivery options from NEWSLETTER_* settings."""
+    if workers is None:
+        workers = getattr(settings, 'NEWSLETTER_WORKERS', 4)
+    if rate is None:
+        rate = getattr(settings, 'NEWSLETTER_RATE_LIMIT', 0)
+    if connection_rate is None:
+        connection_rate = getattr(settings, 'NEWSLETTER_CONNECTION_RATE_LIMIT', 0)
+    return max(int(workers), 1), rate, connection_rate
+
+
+def deliver(newsletter, batches, workers=None, rate=None, connection_rate=None, on_batch=None):
+    """
+    Send a CompiledNewsletter to batches of recipients using a pool of worker threads.
+
+    batches - итерируемая последовательность списков (subscription_id, email); читается в
+    вызывающем потоке, поэтому запросы к БД остаются в нём. on_batch(result)
+    тоже вызывается в вызывающем потоке - там удобно сохранять прогресс.
+    Потоки-отправители к БД не обращаются.
+    """
+    workers, rate, connection_rate = get_delivery_options(workers, rate, connection_rate)
+    rate_limiter = TokenBucket(rate)
+    connection_limiter = TokenBucket(connection_rate)
+
+    # Ограниченная очередь: чтение из БД не убегает далеко вперёд отправки
+    tasks = queue.Queue(maxsize=workers * 2)
+    results = queue.Queue()
+    threads = [
+        DeliveryWorker(newsletter, tasks, results, rate_limiter, connection_limiter)
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    pending = 0
+
+    def collect(block):
+        nonlocal pending
+        while pending:
+            try:
+                result = results.get(block=block)
+            except queue.Empty:
+                return
+            pending -= 1
+            if on_batch:
+                on_batch(result)
+
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            tasks.put(batch)
+            pending += 1
+            collect(block=False)
+    finally:
+        for _ in threads:
+            tasks.put(None)
+        collect(block=True)
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,74 @@
+"""
+Management command to benchmark per-recipient newsletter rendering.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from newsletters.delivery import build_newsletter_message
+from newsletters.models import NewsletterTemplate
+from newsletters.rendering import CompiledNewsletter, html_to_text
+
+SAMPLE_HTML = '''
+<h1>Новости MMO Board</h1>
+<p>Привет, {{ email }}!</p>
+<p>На этой неделе: <a href="https://example.com/raids">новые рейды</a>, обновлённый аукцион
+и турнир гильдий.</p>
+<ul>
+    <li>Рейд на Огненного дракона - суббота, 20:00</li>
+    <li>Скидки у кузнецов до конца месяца</li>
+    <li>Набор в гильдию &laquo;Северный ветер&raquo;</li>
+</ul>
+{% for i in "12345" %}<p>Раздел {{ i }}: Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>{% endfor %}
+<p><a href="{{ unsubscribe_url }}">Отписаться от рассылки</a></p>
+'''
+
+
+class Command(BaseCommand):
+    help = 'Compare compiling the newsletter template per recipient with compiling it once per job'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients',
+            type=int,
+            default=10000,
+            help='Number of recipients (default: 10000)',
+        )
+
+    def handle(self, *args, **options):
+        count = options.get('recipients', 10000)
+        template = NewsletterTemplate(title='Новости недели', html_body=SAMPLE_HTML)
+        recipients = [(i, f'user{i}@example.com') for i in range(count)]
+        engine = Engine.get_default()
+
+        def per_recipient():
+            # Наивный вариант: разбор шаблона и извлечение текста на каждого получателя
+            newsletter = CompiledNewsletter(template, site_url='http://localhost')
+            for subscription_id, email in recipients:
+                context = Context({'email': email, 'unsubscribe_url': newsletter.unsubscribe_url(subscription_id)})
+                engine.from_string(template.html_body).render(context)
+                html_to_text(engine.from_string(template.html_body).render(context))
+
+        def compiled_once():
+            newsletter = CompiledNewsletter(template, site_url='http://localhost')
+            for recipient in recipients:
+                newsletter.render(*recipient)
+
+        def full_message():
+            newsletter = CompiledNewsletter(template, site_url='http://localhost')
+            for recipient in recipients:
+                build_newsletter_message(newsletter, recipient).message()
+
+        scale = 10000 / count
+        for label, run in (
+            ('compile per recipient', per_recipient),
+            ('compile once per job', compiled_once),
+            ('compile once + MIME message', full_message),
+        ):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label:<28} {elapsed * scale * 1000:9.1f} ms per 10k recipients '
+                f'({elapsed * 1e6 / count:.1f} us each)'
+            )
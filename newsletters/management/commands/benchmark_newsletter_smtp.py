@@ -0,0 +1,120 @@
+"""
+Management command to benchmark newsletter sending against a local stub SMTP server.
+"""
+import socketserver
+import threading
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from newsletters.models import NewsletterTemplate
+from newsletters.rendering import CompiledNewsletter
+from newsletters.delivery import build_newsletter_message, send_messages_over_connection
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: accepts everything, stores nothing."""
+    connect_latency = 0.0
+    message_latency = 0.0
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+    def handle(self):
+        # Имитация стоимости установки соединения (TLS, AUTH) на реальном сервере
+        time.sleep(self.connect_latency)
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'EHLO':
+                self.reply('250-stub')
+                self.reply('250 8BITMIME')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                time.sleep(self.message_latency)
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command in (b'HELO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Not implemented')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message SMTP connections with a reused connection on a local stub server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=500,
+            help='Number of messages per run (default: 500)',
+        )
+        parser.add_argument(
+            '--connect-latency',
+            type=float,
+            default=20,
+            help='Simulated connection setup cost in ms (default: 20)',
+        )
+        parser.add_argument(
+            '--message-latency',
+            type=float,
+            default=0,
+            help='Simulated server processing time per message in ms (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        count = options.get('messages', 500)
+        StubSMTPHandler.connect_latency = options.get('connect_latency', 20) / 1000
+        StubSMTPHandler.message_latency = options.get('message_latency', 0) / 1000
+
+        server = StubSMTPServer(('127.0.0.1', 0), StubSMTPHandler)
+        host, port = server.server_address
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        template = NewsletterTemplate(title='Benchmark', html_body='<h1>Новости</h1><p>' + 'Текст. ' * 200 + '</p>')
+        newsletter = CompiledNewsletter(template, site_url='http://localhost')
+        recipients = [(i, f'user{i}@example.com') for i in range(count)]
+
+        def connect():
+            return get_connection(
+                backend='django.core.mail.backends.smtp.EmailBackend',
+                host=host, port=port, username='', password='',
+                use_tls=False, use_ssl=False, fail_silently=False,
+            )
+
+        try:
+            # Прежний способ: send_mail на каждого подписчика - новое соединение на письмо
+            started = time.perf_counter()
+            for recipient in recipients:
+                connection = connect()
+                connection.send_messages([build_newsletter_message(newsletter, recipient, connection)])
+            per_message = time.perf_counter() - started
+
+            # Одно соединение на пачку, письма собраны заранее
+            started = time.perf_counter()
+            connection = connect()
+            connection.open()
+            messages = [build_newsletter_message(newsletter, recipient, connection) for recipient in recipients]
+            failures = send_messages_over_connection(connection, messages)
+            connection.close()
+            reused = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f'per-message connection: {count / per_message:8.1f} messages/sec')
+        self.stdout.write(f'reused connection:      {count / reused:8.1f} messages/sec ({len(failures)} failures)')
+        self.stdout.write(self.style.SUCCESS(f'\nSpeedup: {per_message / reused:.2f}x ({count} messages)'))
@@ -3,7 +3,7 @@ Management command to send newsletters.
 """
 from django.core.management.base import BaseCommand
 from newsletters.models import NewsletterSendJob
-from newsletters.services import send_newsletter_batch
+from newsletters.services import process_newsletter_queue, retry_failed_deliveries, send_newsletter_batch
 
 
 class Command(BaseCommand):
@@ -22,36 +22,67 @@ class Command(BaseCommand):
             help='Batch size for sending (default: 50)',
         )
         parser.add_argument(
-            '--delay',
+            '--workers',
             type=int,
-            default=2,
-            help='Delay between batches in seconds (default: 2)',
+            help='Parallel sender threads, each with its own SMTP connection (default: NEWSLETTER_WORKERS)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Max messages per second across all workers, 0 - unlimited (default: NEWSLETTER_RATE_LIMIT)',
+        )
+        parser.add_argument(
+            '--connection-rate',
+            type=float,
+            help='Max new SMTP connections per second, 0 - unlimited (default: NEWSLETTER_CONNECTION_RATE_LIMIT)',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Resend only failed deliveries of finished jobs (all failed jobs or --job-id)',
         )
 
     def handle(self, *args, **options):
         job_id = options.get('job_id')
         batch_size = options.get('batch_size', 50)
-        delay = options.get('delay', 2)
+        delivery_options = {
+            'workers': options.get('workers'),
+            'rate': options.get('rate'),
+            'connection_rate': options.get('connection_rate'),
+        }
         
-        if job_id:
+        if options.get('retry_failed'):
+            self.retry_failed(job_id, batch_size, delivery_options)
+        elif job_id:
             # Process specific job
-            try:
-                job = NewsletterSendJob.objects.get(pk=job_id)
-                send_newsletter_batch(job.template.id, batch_size=batch_size, delay=delay)
-                self.stdout.write(self.style.SUCCESS(f'Job {job_id} processed.'))
-            except NewsletterSendJob.DoesNotExist:
+            if not NewsletterSendJob.objects.filter(pk=job_id).exists():
                 self.stdout.write(self.style.ERROR(f'Job {job_id} not found.'))
+                return
+            job = send_newsletter_batch(job_id, batch_size=batch_size, **delivery_options)
+            if job is None:
+                self.stdout.write(self.style.WARNING(f'Job {job_id} is finished or being sent by another worker.'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Job {job_id} processed.'))
         else:
-            # Process all queued jobs
-            queued_jobs = NewsletterSendJob.objects.filter(
-                status__in=[NewsletterSendJob.Status.QUEUED, NewsletterSendJob.Status.SENDING]
-            )
-            
-            for job in queued_jobs:
-                self.stdout.write(f'Processing job {job.id}...')
-                send_newsletter_batch(job.template.id, batch_size=batch_size, delay=delay)
+            # Process all queued jobs; several commands can run in parallel
+            jobs = process_newsletter_queue(batch_size=batch_size, **delivery_options)
+            for job in jobs:
                 self.stdout.write(self.style.SUCCESS(f'Job {job.id} processed.'))
             
-            if not queued_jobs.exists():
+            if not jobs:
                 self.stdout.write(self.style.WARNING('No queued jobs found.'))
 
+    def retry_failed(self, job_id, batch_size, delivery_options):
+        jobs = NewsletterSendJob.objects.filter(status=NewsletterSendJob.Status.FAILED)
+        if job_id:
+            jobs = jobs.filter(pk=job_id)
+        
+        for job in jobs:
+            self.stdout.write(f'Retrying failed deliveries of job {job.id} ({job.errors} errors)...')
+            job = retry_failed_deliveries(job.id, batch_size=batch_size, **delivery_options)
+            if job is None:
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Job {job.id}: {job.sent} sent, {job.errors} errors.'))
+        
+        if not jobs.exists():
+            self.stdout.write(self.style.WARNING('No failed jobs found.'))
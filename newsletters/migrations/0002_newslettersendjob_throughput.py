@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettersendjob',
+            name='throughput',
+            field=models.FloatField(blank=True, null=True, verbose_name='Скорость (писем/сек)'),
+        ),
+    ]
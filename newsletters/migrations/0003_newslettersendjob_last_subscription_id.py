@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0002_newslettersendjob_throughput'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettersendjob',
+            name='last_subscription_id',
+            field=models.BigIntegerField(default=0, verbose_name='Последняя обработанная подписка'),
+        ),
+    ]
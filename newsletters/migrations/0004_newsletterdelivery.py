@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0003_newslettersendjob_last_subscription_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('sent', 'Отправлено'), ('failed', 'Ошибка')], max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=1, verbose_name='Попыток')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='newsletters.newslettersendjob', verbose_name='Задача рассылки')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='newsletters.subscription', verbose_name='Подписка')),
+            ],
+            options={
+                'verbose_name': 'Доставка рассылки',
+                'verbose_name_plural': 'Доставки рассылок',
+                'indexes': [models.Index(fields=['job', 'status'], name='newsletter_delivery_job_status')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'subscription'), name='newsletter_delivery_unique')],
+            },
+        ),
+    ]
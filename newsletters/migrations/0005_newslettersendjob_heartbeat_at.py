@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0004_newsletterdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettersendjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность'),
+        ),
+    ]
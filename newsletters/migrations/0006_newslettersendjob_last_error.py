@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0005_newslettersendjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettersendjob',
+            name='last_error',
+            field=models.TextField(blank=True, verbose_name='Последняя ошибка'),
+        ),
+    ]
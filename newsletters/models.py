@@ -1,9 +1,12 @@
 """
 Models for newsletters app.
 """
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
+from django.template import TemplateSyntaxError
 from django.utils import timezone
+from .rendering import compile_templates
 
 
 class Subscription(models.Model):
@@ -40,6 +43,13 @@ class NewsletterTemplate(models.Model):
     
     def __str__(self):
         return self.title
+    
+    def clean(self):
+        # Ошибку синтаксиса показываем при сохранении, а не при отправке рассылки
+        try:
+            compile_templates(self.html_body)
+        except TemplateSyntaxError as exc:
+            raise ValidationError({'html_body': f'Ошибка в шаблоне: {exc}'})
 
 
 class NewsletterSendJob(models.Model):
@@ -65,8 +75,15 @@ class NewsletterSendJob(models.Model):
     total = models.IntegerField(default=0, verbose_name='Всего получателей')
     sent = models.IntegerField(default=0, verbose_name='Отправлено')
     errors = models.IntegerField(default=0, verbose_name='Ошибок')
+    throughput = models.FloatField(null=True, blank=True, verbose_name='Скорость (писем/сек)')
+    # Контрольная точка: все подписки с id <= last_subscription_id уже обработаны
+    last_subscription_id = models.BigIntegerField(default=0, verbose_name='Последняя обработанная подписка')
     started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало отправки')
     finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание отправки')
+    # Обновляется после каждой пачки; задача в статусе sending без отметок
+    # дольше NEWSLETTER_JOB_LEASE считается брошенной и может быть подхвачена
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя активность')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
     
     class Meta:
         verbose_name = 'Задача рассылки'
@@ -76,3 +93,45 @@ class NewsletterSendJob(models.Model):
     def __str__(self):
         return f'Рассылка {self.template.title} - {self.status}'
 
+
+
+class NewsletterDelivery(models.Model):
+    """Per-recipient delivery record of a newsletter send job."""
+    class Status(models.TextChoices):
+        SENT = 'sent', 'Отправлено'
+        FAILED = 'failed', 'Ошибка'
+    
+    job = models.ForeignKey(
+        NewsletterSendJob,
+        on_delete=models.CASCADE,
+        related_name='deliveries',
+        verbose_name='Задача рассылки'
+    )
+    subscription = models.ForeignKey(
+        Subscription,
+        on_delete=models.CASCADE,
+        related_name='deliveries',
+        verbose_name='Подписка'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=1, verbose_name='Попыток')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+    
+    class Meta:
+        verbose_name = 'Доставка рассылки'
+        verbose_name_plural = 'Доставки рассылок'
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'subscription'], name='newsletter_delivery_unique'),
+        ]
+        indexes = [
+            # Сводка по статусам задачи и выборка ошибок для повтора
+            models.Index(fields=['job', 'status'], name='newsletter_delivery_job_status'),
+        ]
+    
+    def __str__(self):
+        return f'{self.job_id}: {self.subscription_id} - {self.status}'
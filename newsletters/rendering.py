@@ -0,0 +1,97 @@
+"""
+Newsletter rendering.
+
+Шаблон рассылки компилируется движком Django один раз на задачу, а затем
+в плотном цикле рендерится для каждого получателя с минимальным контекстом:
+email и ссылка отписки. Текстовая версия письма выводится из HTML тоже один
+раз - как отдельный шаблон, поэтому персонализация работает и в ней.
+"""
+import html
+import re
+from django.conf import settings
+from django.core import signing
+from django.template import Context, Engine
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+UNSUBSCRIBE_SALT = 'newsletters.unsubscribe'
+
+_LINK_RE = re.compile(r'<a\s[^>]*?href=["\']([^"\']+)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+_BLOCK_END_RE = re.compile(r'</(p|div|h[1-6]|ul|ol|table|blockquote|pre)>', re.IGNORECASE)
+_LINE_END_RE = re.compile(r'<br\s*/?>|</(li|tr)>', re.IGNORECASE)
+_ITEM_RE = re.compile(r'<li[^>]*>', re.IGNORECASE)
+_DROP_RE = re.compile(r'<(style|script|head)[^>]*>.*?</\1>', re.IGNORECASE | re.DOTALL)
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+
+
+def html_to_text(source):
+    """
+    Convert newsletter HTML to plain text, keeping template tags intact.
+
+    Пробелы исходника схлопываются как в браузере; ссылки превращаются
+    в "текст (адрес)", блоки - в абзацы, <br> и пункты списков - в строки.
+    """
+    text = ' '.join(_DROP_RE.sub('', source).split())
+    text = _LINK_RE.sub(lambda m: f'{m.group(2)} ({m.group(1)})', text)
+    text = _ITEM_RE.sub('- ', text)
+    text = _BLOCK_END_RE.sub('\n\n', text)
+    text = _LINE_END_RE.sub('\n', text)
+    text = html.unescape(strip_tags(text))
+    lines = [line.strip() for line in text.splitlines()]
+    return _BLANK_LINES_RE.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def make_unsubscribe_token(subscription_id):
+    return signing.Signer(salt=UNSUBSCRIBE_SALT).sign(str(subscription_id))
+
+
+def read_unsubscribe_token(token):
+    """Return subscription id from an unsubscribe token, or None if it is invalid."""
+    try:
+        return int(signing.Signer(salt=UNSUBSCRIBE_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def get_site_url():
+    """Absolute base URL for links in emails (SITE_URL or the current Site)."""
+    site_url = getattr(settings, 'SITE_URL', '')
+    if not site_url:
+        from django.contrib.sites.models import Site
+        scheme = 'http' if settings.DEBUG else 'https'
+        site_url = f'{scheme}://{Site.objects.get_current().domain}'
+    return site_url.rstrip('/')
+
+
+def compile_templates(html_body):
+    """
+    Compile the HTML body and the text version derived from it.
+
+    Returns (html_template, text_template); raises TemplateSyntaxError
+    for a broken body (проверяется и в NewsletterTemplate.clean).
+    """
+    engine = Engine.get_default()
+    html_template = engine.from_string(html_body)
+    text_template = engine.from_string('{% autoescape off %}' + html_to_text(html_body) + '{% endautoescape %}')
+    return html_template, text_template
+
+
+class CompiledNewsletter:
+    """Newsletter template compiled once; renders subject, HTML and text per recipient."""
+    def __init__(self, template, site_url=None):
+        self.subject = template.title
+        self.html_template, self.text_template = compile_templates(template.html_body)
+        self.site_url = site_url if site_url is not None else get_site_url()
+        # reverse() один раз на задачу, для получателя подставляется только токен
+        self.unsubscribe_url_pattern = self.site_url + reverse('newsletters:unsubscribe_link', args=['__token__'])
+
+    def unsubscribe_url(self, subscription_id):
+        return self.unsubscribe_url_pattern.replace('__token__', make_unsubscribe_token(subscription_id))
+
+    def render(self, subscription_id, email):
+        """Return (html, text, unsubscribe_url) for one recipient."""
+        unsubscribe_url = self.unsubscribe_url(subscription_id)
+        context = Context({'email': email, 'unsubscribe_url': unsubscribe_url})
+        html_body = self.html_template.render(context)
+        text_body = self.text_template.render(context)
+        return html_body, text_body, unsubscribe_url
@@ -1,11 +1,19 @@
 """
 Services for newsletters app.
 """
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+import logging
+import time
+from datetime import timedelta
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.template import TemplateSyntaxError
 from django.utils import timezone
-from .models import Subscription, NewsletterTemplate, NewsletterSendJob
+from .delivery import BatchCheckpoint, deliver
+from .models import Subscription, NewsletterSendJob, NewsletterDelivery
+from .rendering import CompiledNewsletter
+
+logger = logging.getLogger('newsletters')
 
 
 def subscribe_user(user):
@@ -31,75 +39,287 @@ def unsubscribe_user(user):
         return None
 
 
-def send_newsletter_batch(template_id, batch_size=50, delay=2):
+def summarize_deliveries(job):
+    """Delivery counts by status for a job (served by the (job, status) index)."""
+    summary = {status: 0 for status in NewsletterDelivery.Status.values}
+    rows = NewsletterDelivery.objects.filter(job=job).values('status').annotate(count=Count('id')).order_by()
+    for row in rows:
+        summary[row['status']] = row['count']
+    return summary
+
+
+def finish_job(job):
+    """Set final counters from the delivery ledger and mark the job done or failed."""
+    summary = summarize_deliveries(job)
+    job.sent = summary[NewsletterDelivery.Status.SENT]
+    job.errors = summary[NewsletterDelivery.Status.FAILED]
+    job.status = NewsletterSendJob.Status.DONE if job.errors == 0 else NewsletterSendJob.Status.FAILED
+    job.last_error = ''
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def compile_job_newsletter(job):
+    """
+    Compile the job template, or mark the job failed and return None.
+    
+    Без этого задача с битым шаблоном оставалась бы в sending и после
+    каждого NEWSLETTER_JOB_LEASE подхватывалась и падала снова.
+    """
+    try:
+        return CompiledNewsletter(job.template)
+    except TemplateSyntaxError as exc:
+        logger.error(f'Newsletter job {job.pk}: template error: {exc}')
+        job.status = NewsletterSendJob.Status.FAILED
+        job.last_error = f'Ошибка в шаблоне: {exc}'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'last_error', 'finished_at'])
+        return None
+
+
+def record_deliveries(job, result):
+    """Write ledger rows for a finished batch with a single bulk insert."""
+    errors = {recipient[0]: str(error) for recipient, error in result.failures}
+    rows = [
+        NewsletterDelivery(
+            job=job,
+            subscription_id=subscription_id,
+            status=NewsletterDelivery.Status.FAILED if subscription_id in errors else NewsletterDelivery.Status.SENT,
+            last_error=errors.get(subscription_id, ''),
+        )
+        for subscription_id, _ in result.batch
+    ]
+    # Строка уже может быть (ошибка до сбоя за контрольной точкой) - перезаписываем
+    NewsletterDelivery.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['job', 'subscription'],
+        update_fields=['status', 'last_error', 'updated_at'],
+    )
+
+
+def claim_newsletter_job(job_id=None):
     """
-    Send newsletter in batches.
+    Atomically take a job for sending: the given one or the oldest available.
+    
+    Доступны задачи в очереди и брошенные (sending без отметок дольше
+    NEWSLETTER_JOB_LEASE). Строка блокируется select_for_update(skip_locked=True),
+    так что параллельные обработчики не ждут друг друга и не берут одну задачу;
+    условный UPDATE страхует СУБД без SELECT ... FOR UPDATE (SQLite).
+    Returns the claimed job or None.
     """
-    import time
+    now = timezone.now()
+    lease = getattr(settings, 'NEWSLETTER_JOB_LEASE', 5 * 60)
+    available = (
+        Q(status=NewsletterSendJob.Status.QUEUED)
+        | Q(status=NewsletterSendJob.Status.SENDING, heartbeat_at__lt=now - timedelta(seconds=lease))
+        | Q(status=NewsletterSendJob.Status.SENDING, heartbeat_at__isnull=True)
+    )
+    with transaction.atomic():
+        jobs = NewsletterSendJob.objects.select_for_update(skip_locked=True).filter(available)
+        if job_id is not None:
+            jobs = jobs.filter(pk=job_id)
+        job = jobs.order_by('pk').first()
+        if job is None:
+            return None
+        
+        claimed = NewsletterSendJob.objects.filter(
+            pk=job.pk,
+            status=job.status,
+            heartbeat_at=job.heartbeat_at,
+        ).update(
+            status=NewsletterSendJob.Status.SENDING,
+            started_at=job.started_at or now,
+            heartbeat_at=now,
+        )
+        if not claimed:
+            return None
     
-    template = NewsletterTemplate.objects.get(pk=template_id)
+    job.refresh_from_db()
+    return job
+
+
+def send_newsletter_batch(job_id, batch_size=50, workers=None, rate=None, connection_rate=None):
+    """
+    Claim the job and send its newsletter in batches.
+    
+    Returns the finished job, or None if the job is not available
+    (already sent or being sent by another worker).
+    """
+    job = claim_newsletter_job(job_id)
+    if job is None:
+        return None
+    return run_newsletter_job(job, batch_size, workers=workers, rate=rate, connection_rate=connection_rate)
+
+
+def process_newsletter_queue(batch_size=50, workers=None, rate=None, connection_rate=None):
+    """Claim and send available jobs one by one until the queue is empty; returns processed jobs."""
+    processed = []
+    while True:
+        job = claim_newsletter_job()
+        if job is None:
+            return processed
+        processed.append(
+            run_newsletter_job(job, batch_size, workers=workers, rate=rate, connection_rate=connection_rate)
+        )
+
+
+def run_newsletter_job(job, batch_size=50, workers=None, rate=None, connection_rate=None):
+    """
+    Send a claimed job in batches.
+    
+    Пачки раздаются workers потокам, у каждого своё SMTP-соединение;
+    скорость ограничивается rate (писем/сек) и connection_rate
+    (новых соединений/сек), см. newsletters.delivery.
+    """
+    # Шаблон компилируется один раз на задачу
+    newsletter = compile_job_newsletter(job)
+    if newsletter is None:
+        return job
     
     # Get active subscriptions
-    subscriptions = Subscription.objects.filter(is_active=True).select_related('user')
-    total = subscriptions.count()
-    
-    # Create or get send job
-    job, created = NewsletterSendJob.objects.get_or_create(
-        template=template,
-        status__in=[NewsletterSendJob.Status.QUEUED, NewsletterSendJob.Status.SENDING],
-        defaults={
-            'status': NewsletterSendJob.Status.QUEUED,
-            'total': total
-        }
+    subscriptions = Subscription.objects.filter(is_active=True)
+    
+    # Получатели идут по возрастанию pk от контрольной точки: подписки,
+    # появившиеся во время отправки, не сдвигают уже пройденную часть списка.
+    # Всего = записи журнала + оставшиеся без записи (пачки за контрольной
+    # точкой, завершённые до сбоя, уже есть в журнале и не считаются дважды)
+    remaining = subscriptions.filter(pk__gt=job.last_subscription_id).exclude(
+        pk__in=job.deliveries.values('subscription_id')
     )
+    job.total = sum(summarize_deliveries(job).values()) + remaining.count()
+    job.save(update_fields=['total'])
     
-    if not created:
-        job.total = total
-        job.save()
+    checkpoint = BatchCheckpoint(job.last_subscription_id)
+    # Пачки за контрольной точкой могли быть отправлены до сбоя - по журналу
+    # доставок пропускаем уже получивших письмо
+    delivered_until = job.deliveries.aggregate(last=Max('subscription_id'))['last'] or 0
     
-    if job.status == NewsletterSendJob.Status.QUEUED:
-        job.status = NewsletterSendJob.Status.SENDING
-        job.started_at = timezone.now()
-        job.save()
+    def batches():
+        last_id = job.last_subscription_id
+        while True:
+            batch = list(
+                subscriptions.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', 'user__email')[:batch_size]
+            )
+            if not batch:
+                return
+            last_id = batch[-1][0]
+            if batch[0][0] <= delivered_until:
+                sent_ids = set(job.deliveries.filter(
+                    subscription_id__in=[pk for pk, _ in batch],
+                    status=NewsletterDelivery.Status.SENT,
+                ).values_list('subscription_id', flat=True))
+                batch = [recipient for recipient in batch if recipient[0] not in sent_ids]
+                if not batch:
+                    continue
+            checkpoint.dispatched(batch)
+            yield batch
     
-    # Send in batches
-    sent = job.sent
-    errors = job.errors
+    sent_this_run = 0
+    started = time.monotonic()
     
-    for i in range(sent, total, batch_size):
-        batch = subscriptions[i:i + batch_size]
+    def on_batch(result):
+        nonlocal sent_this_run
+        for (_, email), error in result.failures:
+            logger.error(f'Error sending newsletter to {email}: {error}')
         
-        for subscription in batch:
-            try:
-                send_mail(
-                    subject=template.title,
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[subscription.user.email],
-                    html_message=template.html_body,
-                    fail_silently=False,
-                )
-                sent += 1
-            except Exception as e:
-                errors += 1
-                # Log error
-                import logging
-                logger = logging.getLogger('newsletters')
-                logger.error(f'Error sending newsletter to {subscription.user.email}: {e}')
+        sent_this_run += result.sent
+        checkpoint.finished(result.batch)
+        record_deliveries(job, result)
         
         # Update job progress
-        job.sent = sent
-        job.errors = errors
-        job.save()
-        
-        # Delay between batches
-        if i + batch_size < total:
-            time.sleep(delay)
+        job.sent += result.sent
+        job.errors += len(result.failures)
+        job.last_subscription_id = checkpoint.position
+        job.throughput = sent_this_run / (time.monotonic() - started)
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=['sent', 'errors', 'last_subscription_id', 'throughput', 'heartbeat_at'])
     
-    # Mark job as done
-    job.status = NewsletterSendJob.Status.DONE if errors == 0 else NewsletterSendJob.Status.FAILED
-    job.finished_at = timezone.now()
-    job.save()
+    deliver(
+        newsletter,
+        batches(),
+        workers=workers,
+        rate=rate,
+        connection_rate=connection_rate,
+        on_batch=on_batch,
+    )
     
-    return job
+    # Mark job as done
+    return finish_job(job)
+
 
+def retry_failed_deliveries(job_id, batch_size=50, workers=None, rate=None, connection_rate=None):
+    """
+    Resend the newsletter only to recipients whose delivery failed.
+    
+    Returns the finished job, or None if the job is not in the failed state.
+    
+    Ошибки выбираются из журнала по возрастанию pk; каждая пачка
+    обновляется одним bulk_update.
+    """
+    job = NewsletterSendJob.objects.select_related('template').get(pk=job_id)
+    failed = job.deliveries.filter(
+        status=NewsletterDelivery.Status.FAILED,
+        subscription__is_active=True,
+    ).select_related('subscription__user')
+    
+    # Повторяем только завершившуюся с ошибками задачу и только одним обработчиком
+    claimed = NewsletterSendJob.objects.filter(
+        pk=job.pk,
+        status=NewsletterSendJob.Status.FAILED,
+    ).update(status=NewsletterSendJob.Status.SENDING, finished_at=None, heartbeat_at=timezone.now())
+    if not claimed:
+        return None
+    
+    newsletter = compile_job_newsletter(job)
+    if newsletter is None:
+        return job
+    
+    deliveries = {}
+    
+    def batches():
+        last_id = 0
+        while True:
+            rows = list(failed.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not rows:
+                return
+            last_id = rows[-1].pk
+            for row in rows:
+                deliveries[row.subscription_id] = row
+            yield [(row.subscription_id, row.subscription.user.email) for row in rows]
+    
+    def on_batch(result):
+        errors = {recipient[0]: str(error) for recipient, error in result.failures}
+        now = timezone.now()
+        rows = []
+        for subscription_id, email in result.batch:
+            row = deliveries.pop(subscription_id)
+            row.attempts += 1
+            row.updated_at = now
+            if subscription_id in errors:
+                row.last_error = errors[subscription_id]
+                logger.error(f'Error resending newsletter to {email}: {row.last_error}')
+            else:
+                row.status = NewsletterDelivery.Status.SENT
+                row.last_error = ''
+            rows.append(row)
+        NewsletterDelivery.objects.bulk_update(rows, ['status', 'attempts', 'last_error', 'updated_at'])
+        
+        job.sent += result.sent
+        job.errors -= result.sent
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=['sent', 'errors', 'heartbeat_at'])
+    
+    deliver(
+        newsletter,
+        batches(),
+        workers=workers,
+        rate=rate,
+        connection_rate=connection_rate,
+        on_batch=on_batch,
+    )
+    
+    return finish_job(job)
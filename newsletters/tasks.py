@@ -1,21 +1,32 @@
 """
 Tasks for newsletters app (for APScheduler).
 """
-from .models import NewsletterSendJob
-from .services import send_newsletter_batch
+from .services import process_newsletter_queue, send_newsletter_batch
 
 
 def process_newsletter_job(job_id):
-    """Process a newsletter send job."""
-    try:
-        job = NewsletterSendJob.objects.get(pk=job_id)
-        
-        if job.status == NewsletterSendJob.Status.DONE:
-            return
-        
-        # Send newsletter in batches
-        send_newsletter_batch(job.template.id, batch_size=50, delay=2)
-        
-    except NewsletterSendJob.DoesNotExist:
-        pass
+    """Process a newsletter send job (no-op if it is done or already being sent)."""
+    send_newsletter_batch(job_id, batch_size=50)
 
+
+def process_queued_newsletter_jobs():
+    """Periodic job: pick up queued and abandoned newsletter jobs."""
+    process_newsletter_queue(batch_size=50)
+
+
+def enqueue_newsletter_job(job_id):
+    """
+    Schedule immediate processing of a queued job.
+    
+    Задача уже лежит в БД со статусом queued; если планировщик запущен в этом
+    процессе, она стартует сразу, иначе её подберёт process_queued_newsletter_jobs.
+    """
+    from config.apscheduler import add_task, scheduler
+    
+    if scheduler.running:
+        add_task(
+            'newsletters.tasks:process_newsletter_job',
+            args=[job_id],
+            id=f'newsletters.process_newsletter_job.{job_id}',
+            replace_existing=True,
+        )
@@ -9,7 +9,10 @@ app_name = 'newsletters'
 urlpatterns = [
     path('subscribe/', views.subscribe, name='subscribe'),
     path('unsubscribe/', views.unsubscribe, name='unsubscribe'),
+    path('unsubscribe/<str:token>/', views.unsubscribe_link, name='unsubscribe_link'),
     path('templates/', views.template_list, name='template_list'),
     path('send/<int:template_id>/', views.send_newsletter_view, name='send'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/progress/', views.job_progress, name='job_progress'),
 ]
 
@@ -4,9 +4,13 @@ Views for newsletters app.
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.db import transaction
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from .models import Subscription, NewsletterTemplate, NewsletterSendJob
+from .rendering import read_unsubscribe_token
 from .services import subscribe_user, unsubscribe_user
+from .tasks import enqueue_newsletter_job
 
 
 @login_required
@@ -45,6 +49,22 @@ def unsubscribe(request):
     return redirect(next_url)
 
 
+@require_http_methods(["GET", "POST"])
+def unsubscribe_link(request, token):
+    """Unsubscribe by the signed link from a newsletter email (no login required)."""
+    subscription_id = read_unsubscribe_token(token)
+    subscription = get_object_or_404(Subscription.objects.select_related('user'), pk=subscription_id)
+    
+    # GET только показывает подтверждение: почтовые сканеры ссылок не должны отписывать
+    if request.method == 'POST':
+        subscription.is_active = False
+        subscription.save()
+        messages.success(request, 'Вы отписались от рассылки.')
+        return redirect('adverts:list')
+    
+    return render(request, 'newsletters/unsubscribe_confirm.html', {'subscription': subscription})
+
+
 @user_passes_test(lambda u: u.is_staff)
 def template_list(request):
     """List newsletter templates (admin only)."""
@@ -58,22 +78,48 @@ def send_newsletter_view(request, template_id):
     template = get_object_or_404(NewsletterTemplate, pk=template_id)
     
     if request.method == 'POST':
-        # Create send job
-        job = NewsletterSendJob.objects.create(
-            template=template,
-            status=NewsletterSendJob.Status.QUEUED
-        )
-        
-        # Start sending (this will be handled by APScheduler or management command)
-        from .services import send_newsletter_batch
-        # For now, process synchronously (in production, use APScheduler)
-        try:
-            send_newsletter_batch(template.id, batch_size=50, delay=2)
-            messages.success(request, f'Рассылка "{template.title}" запущена!')
-        except Exception as e:
-            messages.error(request, f'Ошибка при отправке рассылки: {e}')
+        # Задача ставится в очередь, отправкой занимается планировщик
+        with transaction.atomic():
+            job = NewsletterSendJob.objects.create(
+                template=template,
+                status=NewsletterSendJob.Status.QUEUED,
+                total=Subscription.objects.filter(is_active=True).count(),
+            )
+            transaction.on_commit(lambda: enqueue_newsletter_job(job.pk))
         
-        return redirect('newsletters:template_list')
+        messages.success(request, f'Рассылка "{template.title}" поставлена в очередь.')
+        return redirect('newsletters:job_detail', job_id=job.pk)
     
     return render(request, 'newsletters/send_newsletter.html', {'template': template})
 
+
+def _job_progress(job):
+    percent = round((job.sent + job.errors) * 100 / job.total) if job.total else 0
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'total': job.total,
+        'sent': job.sent,
+        'errors': job.errors,
+        'percent': min(percent, 100),
+        'throughput': round(job.throughput, 1) if job.throughput else None,
+        'finished': job.status in (NewsletterSendJob.Status.DONE, NewsletterSendJob.Status.FAILED),
+    }
+
+
+@user_passes_test(lambda u: u.is_staff)
+def job_detail(request, job_id):
+    """Newsletter send job progress page (admin only)."""
+    job = get_object_or_404(NewsletterSendJob.objects.select_related('template'), pk=job_id)
+    return render(request, 'newsletters/job_detail.html', {'job': job, 'progress': _job_progress(job)})
+
+
+@user_passes_test(lambda u: u.is_staff)
+def job_progress(request, job_id):
+    """Newsletter send job counters as JSON for polling (admin only)."""
+    job = get_object_or_404(
+        NewsletterSendJob.objects.only('status', 'total', 'sent', 'errors', 'throughput'),
+        pk=job_id,
+    )
+    return JsonResponse(_job_progress(job))
@@ -2,7 +2,7 @@
 Admin configuration for replies app.
 """
 from django.contrib import admin
-from .models import Reply
+from .models import Reply, NotificationOutbox
 
 
 @admin.register(Reply)
@@ -15,3 +15,13 @@ class ReplyAdmin(admin.ModelAdmin):
     raw_id_fields = ['advert', 'author']
     date_hierarchy = 'created_at'
 
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    """NotificationOutbox admin."""
+    list_display = ['reply', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind', 'created_at']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    raw_id_fields = ['reply']
+    date_hierarchy = 'created_at'
@@ -5,4 +5,6 @@ class RepliesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'replies'
     verbose_name = 'Отклики'
-
+    
+    def ready(self):
+        import replies.signals
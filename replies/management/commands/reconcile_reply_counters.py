@@ -0,0 +1,21 @@
+"""
+Management command to recompute advert reply counters.
+"""
+from django.core.management.base import BaseCommand
+from replies.services import reconcile_reply_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute Advert reply counters (total, pending, accepted) from replies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Adverts per UPDATE (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        total = reconcile_reply_counters(batch_size=options.get('batch_size', 1000))
+        self.stdout.write(self.style.SUCCESS(f'Reconciled reply counters of {total} adverts.'))
@@ -0,0 +1,30 @@
+"""
+Management command to send queued reply notifications.
+"""
+from django.core.management.base import BaseCommand
+from replies.services import process_notification_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send due reply notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Notifications per SMTP connection (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size', 50)
+
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = process_notification_outbox(limit=batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < batch_size:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Sent: {total_sent}, failed: {total_failed}'))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_advert_owner(apps, schema_editor):
+    """Copy advert.author into existing replies with one correlated UPDATE."""
+    Advert = apps.get_model('adverts', 'Advert')
+    Reply = apps.get_model('replies', 'Reply')
+    Reply.objects.filter(advert_owner__isnull=True).update(
+        advert_owner=models.Subquery(
+            Advert.objects.filter(pk=models.OuterRef('advert_id')).values('author_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0007_advert_reply_counters'),
+        ('replies', '0002_notificationoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='advert_owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_replies', to=settings.AUTH_USER_MODEL, verbose_name='Автор объявления'),
+        ),
+        migrations.RunPython(backfill_advert_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reply',
+            name='advert_owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_replies', to=settings.AUTH_USER_MODEL, verbose_name='Автор объявления'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['advert_owner', 'status', '-created_at'], name='replies_rep_advert__6aaf6f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['advert_owner', '-created_at'], name='replies_rep_advert__44060f_idx'),
+        ),
+    ]
@@ -25,6 +25,14 @@ class Reply(models.Model):
         related_name='replies',
         verbose_name='Автор отклика'
     )
+    # Копия advert.author: входящие отклики выбираются по индексу без join с объявлениями
+    advert_owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='received_replies',
+        editable=False,
+        verbose_name='Автор объявления'
+    )
     text = models.TextField(verbose_name='Текст отклика')
     status = models.CharField(
         max_length=20,
@@ -43,8 +51,62 @@ class Reply(models.Model):
         indexes = [
             models.Index(fields=['advert', 'status', '-created_at']),
             models.Index(fields=['author', '-created_at']),
+            models.Index(fields=['advert_owner', 'status', '-created_at']),
+            models.Index(fields=['advert_owner', '-created_at']),
         ]
     
     def __str__(self):
         return f'Отклик от {self.author.email} на "{self.advert.title}"'
+    
+    def save(self, *args, **kwargs):
+        if self.advert_owner_id is None:
+            self.advert_owner_id = self.advert.author_id
+        super().save(*args, **kwargs)
 
+
+
+class NotificationOutbox(models.Model):
+    """
+    Transactional outbox for reply email notifications.
+    
+    Запись создаётся в той же транзакции, что и изменение отклика;
+    письма отправляет фоновый обработчик (replies.tasks).
+    """
+    class Kind(models.TextChoices):
+        REPLY = 'reply', 'Новый отклик'
+        ACCEPT = 'accept', 'Отклик принят'
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает отправки'
+        SENT = 'sent', 'Отправлено'
+        FAILED = 'failed', 'Ошибка'
+    
+    kind = models.CharField(max_length=20, choices=Kind.choices, verbose_name='Тип')
+    reply = models.ForeignKey(
+        Reply,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Отклик'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено')
+    
+    class Meta:
+        verbose_name = 'Уведомление в очереди'
+        verbose_name_plural = 'Очередь уведомлений'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.reply_id} - {self.status}'
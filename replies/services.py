@@ -1,12 +1,22 @@
 """
 Services for replies app.
 """
-from django.core.mail import send_mail
+import logging
+from datetime import timedelta
+from django.core.mail import send_mail, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import NotificationOutbox, Reply
+from .signals import reply_status_changed
 
+logger = logging.getLogger('replies')
 
-def send_reply_notification(reply):
+
+def send_reply_notification(reply, connection=None):
     """Send email notification to advert author when a new reply is created."""
     advert = reply.advert
     author = advert.author
@@ -32,10 +42,11 @@ def send_reply_notification(reply):
         recipient_list=[author.email],
         html_message=html_message,
         fail_silently=False,
+        connection=connection,
     )
 
 
-def send_accept_notification(reply):
+def send_accept_notification(reply, connection=None):
     """Send email notification to reply author when reply is accepted."""
     reply_author = reply.author
     advert = reply.advert
@@ -61,5 +72,208 @@ def send_accept_notification(reply):
         recipient_list=[reply_author.email],
         html_message=html_message,
         fail_silently=False,
+        connection=connection,
+    )
+
+
+
+NOTIFICATION_SENDERS = {
+    NotificationOutbox.Kind.REPLY: send_reply_notification,
+    NotificationOutbox.Kind.ACCEPT: send_accept_notification,
+}
+
+
+def enqueue_notification(reply, kind):
+    """
+    Queue email notification for reply in the outbox.
+    
+    Должно вызываться внутри транзакции, изменяющей отклик: письмо
+    уйдёт только если транзакция зафиксирована.
+    """
+    return NotificationOutbox.objects.create(reply=reply, kind=kind)
+
+
+def _retry_delay(attempts):
+    """Exponential backoff: base * 2^(attempts-1), capped."""
+    base = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_BASE', 60)
+    cap = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_MAX', 60 * 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim_notifications(limit=50):
+    """
+    Claim due notifications with a lease, in a short transaction.
+    
+    Попытка засчитывается сразу, а next_attempt_at сдвигается на
+    NOTIFICATION_OUTBOX_LEASE: если обработчик упадёт во время отправки,
+    уведомление снова станет доступно после аренды. Условный UPDATE
+    (WHERE next_attempt_at = прочитанное) не даёт двум обработчикам взять
+    одну строку и там, где нет SELECT ... FOR UPDATE (SQLite).
+    Returns the claimed notifications.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=getattr(settings, 'NOTIFICATION_OUTBOX_LEASE', 5 * 60))
+    with transaction.atomic():
+        candidates = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationOutbox.Status.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', 'next_attempt_at')[:limit]
+        )
+        claimed = [
+            pk for pk, next_attempt_at in candidates
+            if NotificationOutbox.objects.filter(
+                pk=pk, status=NotificationOutbox.Status.PENDING, next_attempt_at=next_attempt_at
+            ).update(attempts=F('attempts') + 1, next_attempt_at=lease_until)
+        ]
+    return list(
+        NotificationOutbox.objects.filter(pk__in=claimed)
+        .select_related('reply__advert__author', 'reply__author')
+        .order_by('next_attempt_at', 'pk')
     )
 
+
+def process_notification_outbox(limit=50):
+    """
+    Send due notifications from the outbox.
+    
+    Строки забираются короткой транзакцией (claim_notifications), письма
+    уходят вне транзакции, результаты записываются второй короткой
+    транзакцией - SMTP не держит блокировки в БД.
+    Все письма пачки идут через одно SMTP-соединение.
+    Returns (sent, failed) counters.
+    """
+    max_attempts = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+    
+    batch = claim_notifications(limit)
+    if not batch:
+        return sent, failed
+    
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # SMTP недоступен - откладываем всю пачку
+        logger.error(f'Cannot open SMTP connection for notifications: {e}')
+        connection = None
+    
+    try:
+        for notification in batch:
+            try:
+                if connection is None:
+                    raise ConnectionError('SMTP connection is not available')
+                NOTIFICATION_SENDERS[notification.kind](notification.reply, connection=connection)
+            except Exception as e:
+                failed += 1
+                notification.last_error = str(e)
+                if notification.attempts >= max_attempts:
+                    notification.status = NotificationOutbox.Status.FAILED
+                else:
+                    notification.next_attempt_at = timezone.now() + _retry_delay(notification.attempts)
+                logger.error(f'Error sending {notification.kind} notification #{notification.pk}: {e}')
+            else:
+                sent += 1
+                notification.status = NotificationOutbox.Status.SENT
+                notification.sent_at = timezone.now()
+                notification.last_error = ''
+    finally:
+        if connection is not None:
+            connection.close()
+    
+    with transaction.atomic():
+        NotificationOutbox.objects.bulk_update(
+            batch, ['status', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    
+    return sent, failed
+
+
+# Поле счётчика Advert для каждого статуса отклика (удалённые не считаются)
+STATUS_COUNTER_FIELDS = {
+    Reply.Status.PENDING: 'pending_replies_count',
+    Reply.Status.ACCEPTED: 'accepted_replies_count',
+}
+
+
+def update_reply_counters(reply, old_status=None, new_status=None):
+    """
+    Move one reply between advert counters with a single UPDATE ... SET x = x ± 1.
+    
+    old_status=None - отклик создан, new_status=None - отклик удалён физически.
+    Вызывается сигналами replies.signals и change_reply_status.
+    Затем отправляет reply_status_changed (статистика пользователей в accounts).
+    """
+    from adverts.models import Advert
+    from adverts.services import invalidate_advert_cache
+    
+    deltas = {}
+    for status, delta in ((old_status, -1), (new_status, 1)):
+        field = STATUS_COUNTER_FIELDS.get(status)
+        if field:
+            deltas[field] = deltas.get(field, 0) + delta
+            deltas['replies_count'] = deltas.get('replies_count', 0) + delta
+    # Не ниже нуля: отклик мог не попасть в счётчики (загрузка фикстур, данные до миграции)
+    updates = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    
+    advert_id = reply.advert_id
+    Advert.objects.filter(pk=advert_id).update(**updates)
+    # Счётчики показываются на странице объявления и входят в её ETag
+    transaction.on_commit(lambda: invalidate_advert_cache(advert_id))
+    reply_status_changed.send(sender=Reply, reply=reply, old_status=old_status, new_status=new_status)
+
+
+def change_reply_status(reply, new_status, **fields):
+    """
+    Atomically change reply status and advert counters.
+    
+    Статус меняется условным UPDATE (WHERE status = текущий), поэтому
+    двойное нажатие не изменит счётчики дважды. Returns True if changed.
+    """
+    old_status = reply.status
+    fields['updated_at'] = timezone.now()
+    with transaction.atomic():
+        changed = Reply.objects.filter(pk=reply.pk, status=old_status).update(status=new_status, **fields)
+        if not changed:
+            return False
+        update_reply_counters(reply, old_status, new_status)
+    
+    reply.status = new_status
+    for name, value in fields.items():
+        setattr(reply, name, value)
+    return True
+
+
+def reconcile_reply_counters(batch_size=1000):
+    """
+    Recompute advert reply counters from Reply rows, batch by batch of advert ids.
+    
+    Каждая пачка - один UPDATE с коррелированными подзапросами, которые
+    используют индекс (advert, status, -created_at). Returns the number of adverts.
+    """
+    from adverts.models import Advert
+    
+    def count(*statuses):
+        replies = Reply.objects.filter(advert=OuterRef('pk'), status__in=statuses).order_by()
+        return Coalesce(
+            Subquery(replies.values('advert').annotate(count=Count('pk')).values('count')),
+            0,
+        )
+    
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Advert.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        last_id = ids[-1]
+        Advert.objects.filter(pk__in=ids).update(
+            replies_count=count(Reply.Status.PENDING, Reply.Status.ACCEPTED),
+            pending_replies_count=count(Reply.Status.PENDING),
+            accepted_replies_count=count(Reply.Status.ACCEPTED),
+        )
+        total += len(ids)
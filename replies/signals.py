@@ -0,0 +1,54 @@
+"""
+Signals for replies app.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from adverts.models import Advert
+from .models import Reply
+
+# Отклик перешёл между статусами (old_status=None - создан, new_status=None -
+# удалён физически); отправляется из replies.services.update_reply_counters
+reply_status_changed = Signal()
+
+
+@receiver(pre_save, sender=Reply)
+def remember_reply_status(sender, instance, raw=False, **kwargs):
+    """Status stored in the database before save(); status edits via admin move counters too."""
+    if raw or instance._state.adding:
+        instance._stored_status = None
+        return
+    instance._stored_status = Reply.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Reply)
+def count_saved_reply(sender, instance, created, raw=False, **kwargs):
+    """
+    Count the reply in advert counters when it is created or its status changes via save().
+    
+    Любой путь создания (view, админка, shell) учитывается так же, как
+    удаление в decrement_reply_counters. change_reply_status меняет статус
+    UPDATE-ом, сигнал при этом не отправляется.
+    """
+    if raw:
+        return
+    from .services import update_reply_counters
+    old_status = None if created else instance._stored_status
+    if old_status != instance.status:
+        update_reply_counters(instance, old_status=old_status, new_status=instance.status)
+
+
+@receiver(post_delete, sender=Reply)
+def decrement_reply_counters(sender, instance, **kwargs):
+    """Hard delete (admin, cascade) removes the reply from advert counters."""
+    from .services import update_reply_counters
+    update_reply_counters(instance, old_status=instance.status)
+
+
+@receiver(post_save, sender=Advert)
+def sync_reply_advert_owner(sender, instance, created, update_fields=None, **kwargs):
+    """Keep Reply.advert_owner in sync when the advert author changes (admin)."""
+    if created or (update_fields is not None and 'author' not in update_fields):
+        return
+    Reply.objects.filter(advert=instance).exclude(advert_owner_id=instance.author_id).update(
+        advert_owner_id=instance.author_id
+    )
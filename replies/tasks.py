@@ -0,0 +1,14 @@
+"""
+Tasks for replies app (for APScheduler).
+"""
+from django.conf import settings
+from .services import process_notification_outbox
+
+
+def send_pending_notifications():
+    """Drain the notification outbox until no due notifications are left."""
+    batch_size = getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 50)
+    while True:
+        sent, failed = process_notification_outbox(limit=batch_size)
+        if sent + failed < batch_size:
+            break
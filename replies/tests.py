@@ -0,0 +1,80 @@
+"""
+Tests for replies app.
+"""
+from django.test import TestCase
+
+from accounts.models import User
+from adverts.models import Advert, Category
+from .models import Reply
+from .services import update_reply_counters
+
+
+class ReplyCountersTests(TestCase):
+    """Advert reply counters follow replies created, edited and deleted outside the views."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='pass', is_active=True)
+        self.author = User.objects.create_user(email='author@example.com', username='author', password='pass', is_active=True)
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass', is_active=True)
+        category = Category.objects.create(slug='tanks', name='Танки')
+        self.advert = Advert.objects.create(author=self.owner, category=category, title='Гильдия', body_md='Текст')
+
+    def assertCounters(self, replies, pending, accepted):
+        self.advert.refresh_from_db()
+        self.assertEqual(
+            (self.advert.replies_count, self.advert.pending_replies_count, self.advert.accepted_replies_count),
+            (replies, pending, accepted),
+        )
+
+    def test_admin_created_reply_is_counted(self):
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/replies/reply/add/', {
+            'advert': self.advert.pk,
+            'author': self.author.pk,
+            'text': 'Возьмите в группу',
+            'status': Reply.Status.PENDING,
+        })
+        self.assertEqual(response.status_code, 302)
+        reply = Reply.objects.get()
+        self.assertCounters(1, 1, 0)
+
+        response = self.client.post(f'/admin/replies/reply/{reply.pk}/change/', {
+            'advert': self.advert.pk,
+            'author': self.author.pk,
+            'text': 'Возьмите в группу',
+            'status': Reply.Status.ACCEPTED,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(1, 0, 1)
+
+        response = self.client.post(f'/admin/replies/reply/{reply.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(0, 0, 0)
+
+    def test_status_edit_via_save_moves_counters(self):
+        reply = Reply.objects.create(advert=self.advert, author=self.author, text='Текст')
+        self.assertCounters(1, 1, 0)
+
+        reply.status = Reply.Status.ACCEPTED
+        reply.save()
+        self.assertCounters(1, 0, 1)
+
+        reply.status = Reply.Status.DELETED
+        reply.save()
+        self.assertCounters(0, 0, 0)
+
+    def test_advert_delete_cascades(self):
+        Reply.objects.create(advert=self.advert, author=self.author, text='Текст')
+        Reply.objects.create(advert=self.advert, author=self.owner, text='Текст', status=Reply.Status.ACCEPTED)
+
+        self.advert.delete()
+
+        self.assertFalse(Reply.objects.exists())
+
+    def test_counters_do_not_go_below_zero(self):
+        reply = Reply.objects.create(advert=self.advert, author=self.author, text='Текст')
+        Advert.objects.filter(pk=self.advert.pk).update(replies_count=0, pending_replies_count=0)
+
+        update_reply_counters(reply, old_status=Reply.Status.PENDING)
+
+        self.assertCounters(0, 0, 0)
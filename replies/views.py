@@ -4,15 +4,14 @@ Views for replies app.
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from config.pagination import CursorPaginator
 from django.db import transaction
 from django.utils import timezone as tz
-from .models import Reply
+from .models import Reply, NotificationOutbox
 from .forms import ReplyForm
-from .services import send_reply_notification, send_accept_notification
+from .services import change_reply_status, enqueue_notification
 from adverts.models import Advert
 
 
@@ -36,9 +35,10 @@ def reply_create(request):
         reply.author = request.user
         
         with transaction.atomic():
+            # Счётчики объявления обновляет сигнал post_save (replies.signals)
             reply.save()
-            # Send notification email to advert author
-            send_reply_notification(reply)
+            # Queue notification email to advert author (sent by background worker)
+            enqueue_notification(reply, NotificationOutbox.Kind.REPLY)
         
         messages.success(request, 'Отклик успешно отправлен!')
         return redirect('adverts:detail', pk=advert.pk)
@@ -50,22 +50,15 @@ def reply_create(request):
 @login_required
 def my_replies(request):
     """List replies to user's adverts."""
-    # Get all adverts owned by the user
-    user_adverts = Advert.objects.filter(author=request.user)
-    
-    # Get replies to user's adverts
+    # Replies to user's adverts: range scan over (advert_owner, [status,] -created_at)
     queryset = Reply.objects.filter(
-        advert__in=user_adverts
+        advert_owner=request.user
     ).select_related('advert', 'author', 'advert__category')
     
-    # Filter by advert
+    # Filter by advert (advert_owner already limits it to the user's adverts)
     advert_id = request.GET.get('advert')
-    if advert_id:
-        try:
-            advert = Advert.objects.get(pk=advert_id, author=request.user)
-            queryset = queryset.filter(advert=advert)
-        except Advert.DoesNotExist:
-            pass
+    if advert_id and advert_id.isdigit():
+        queryset = queryset.filter(advert_id=advert_id)
     
     # Filter by status
     status = request.GET.get('status')
@@ -77,17 +70,15 @@ def my_replies(request):
     if search_query:
         queryset = queryset.filter(text__icontains=search_query)
     
-    # Order by created_at desc
-    queryset = queryset.order_by('-created_at')
-    
-    # Pagination
+    # Cursor pagination ordered by created_at desc
     paginate_by = getattr(settings, 'PAGINATE_BY', 15)
-    paginator = Paginator(queryset, paginate_by)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(queryset, paginate_by)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
-    # Get user's adverts for filter
-    user_adverts_list = user_adverts.order_by('-created_at')
+    # Get user's adverts for filter (counters instead of COUNT over replies)
+    user_adverts_list = Advert.objects.filter(author=request.user).order_by('-created_at').only(
+        'pk', 'title', 'replies_count', 'pending_replies_count',
+    )
     
     context = {
         'page_obj': page_obj,
@@ -121,10 +112,11 @@ def reply_accept(request, pk):
         return redirect('replies:my_replies')
     
     with transaction.atomic():
-        reply.status = Reply.Status.ACCEPTED
-        reply.save()
-        # Send notification email to reply author
-        send_accept_notification(reply)
+        if not change_reply_status(reply, Reply.Status.ACCEPTED):
+            messages.info(request, 'Статус отклика уже изменён.')
+            return redirect('replies:my_replies')
+        # Queue notification email to reply author (sent by background worker)
+        enqueue_notification(reply, NotificationOutbox.Kind.ACCEPT)
     
     messages.success(request, 'Отклик принят! Автор отклика получит уведомление.')
     return redirect('replies:my_replies')
@@ -142,9 +134,9 @@ def reply_delete(request, pk):
         return redirect('replies:my_replies')
     
     # Soft delete
-    reply.status = Reply.Status.DELETED
-    reply.deleted_at = tz.now()
-    reply.save()
+    if not change_reply_status(reply, Reply.Status.DELETED, deleted_at=tz.now()):
+        messages.info(request, 'Отклик уже удалён.')
+        return redirect('replies:my_replies')
     
     messages.success(request, 'Отклик удалён.')
     return redirect('replies:my_replies')